@@ -1,68 +1,26 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from contextlib import closing
 from datetime import datetime
-from tabulate import tabulate
-
-
-# ---------- DATABASE CONNECTION ----------
-def get_db():
-    """Connect to PostgreSQL database."""
-    return psycopg2.connect(
-        host="localhost",      # change to your host
-        database="society_db", # change to your db name
-        user="postgres",       # change to your username
-        password="admin",      # change to your password
-        port=5432
-    )
-
-
-# ---------- HELPER FUNCTIONS ----------
-def execute_query(query, params=None, fetch=False, many=False):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        if many:
-            cur.executemany(query, params)
-        else:
-            cur.execute(query, params)
-
-        if fetch:
-            data = cur.fetchall()
-        else:
-            data = None
-        conn.commit()
-        return data
-    finally:
-        cur.close()
-        conn.close()
-
-
-# ---------- ADMIN SEED DATA ----------
-def seed_admin():
-    """Insert or update admin credentials."""
-    query = """
-        INSERT INTO admins (username, password)
-        VALUES (%s, %s)
-        ON CONFLICT (username)
-        DO UPDATE SET password = EXCLUDED.password;
-    """
-    execute_query(query, ("admin", "admin123"))
-
-
-def seed_staff():
-    staff = [
-        ("delivery1", "pass123", "delivery"),
-        ("maintenance1", "pass456", "maintenance"),
-        ("maintenance2", "pass890", "maintenance"),
-        ("maintenance5", "pass234", "maintenance"),
-        ("security1", "pass789", "security")
-    ]
-    query = """
-        INSERT INTO staff (username, password, role)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (username) DO NOTHING;
-    """
-    execute_query(query, staff, many=True)
+from announcements import add_announcement, list_active, archive_expired
+from retention import rotate_partitions
+from dashboard import view_society_dashboard
+from sla import view_sla_report
+from queries import execute_prepared, view_query_stats
+from records import ComplaintRow, TaskRow, BookingRow, columns
+from db import execute_query, fetch_records, stream_records
+from resilience import DatabaseUnavailable
+from output import render_table, set_default_format, FORMATS
+from polls import create_poll as insert_poll, poll_results, close_poll, archive_closed_polls
+from models import (TaskAssignment, TaskStatus, ComplaintStatus, SkipQuery, ValidationError, parse_date,
+                    COMPLAINT_TRANSITIONS, allowed_sources)
+from tenants import create_society
+from migrations import migrate_society
+from deliveries import view_reconciliation, sync_flat_routes
+from billing import billing_run_flow
+from analytics import view_complaint_analytics
+from identity import search_residents_flow
+from aminity import slot_occupancy
+from audit import set_actor, audited, record, view_audit_log
 
 
 # ---------- ADMIN LOGIN ----------
@@ -70,9 +28,9 @@ def admin_login():
     print("\n--- Admin Login ---")
     u = input("Enter admin username: ").strip()
     p = input("Enter admin password: ").strip()
-    query = "SELECT * FROM admins WHERE username=%s AND password=%s;"
-    admin = execute_query(query, (u, p), fetch=True)
+    admin = execute_prepared("admin_login", (u, p))
     if admin:
+        set_actor(f"admin:{u}")
         print("✅ Login successful.")
         return admin[0]
     print("❌ Invalid admin credentials.")
@@ -103,8 +61,17 @@ def list_pending_residents():
 
 
 def approve_resident_by_id(resident_id):
-    query = "UPDATE residents SET approved = TRUE WHERE resident_id = %s;"
-    execute_query(query, (resident_id,))
+    approved = audited("approve_resident", "residents", "resident_id", """
+        UPDATE residents r SET approved = TRUE
+        FROM (SELECT * FROM residents WHERE resident_id = %s FOR UPDATE) old
+        WHERE r.resident_id = old.resident_id
+        RETURNING to_jsonb(old) AS before, to_jsonb(r) AS after;
+    """, (resident_id,))
+    if not approved:
+        print(f"❌ No resident with ID {resident_id}.")
+        return
+    # give a newly approved flat its place on the delivery round
+    sync_flat_routes()
     print(f"✅ Approved resident {resident_id}")
 
 
@@ -116,11 +83,12 @@ def assign_common_task():
     staff_name = input("Assign to staff name: ")
 
     query = """
-        INSERT INTO maintenance_tasks (task_name, description, assigned_to, status, created_at, is_common)
-        VALUES (%s, %s, %s, %s, %s, %s);
+        INSERT INTO maintenance_tasks AS t (task_name, description, assigned_to, status, created_at, is_common)
+        VALUES (%s, %s, %s, %s, LOCALTIMESTAMP, %s)
+        RETURNING NULL::jsonb AS before, to_jsonb(t) AS after;
     """
-    execute_query(query, (task_name, description, staff_name, "Pending",
-                          datetime.now().strftime("%Y-%m-%d %H:%M:%S"), True))
+    audited("assign_common_task", "maintenance_tasks", "id", query, (
+        task_name, description, staff_name, "Pending", True))
     print(f"✅ Common task '{task_name}' assigned to {staff_name} successfully!\n")
 
 
@@ -130,35 +98,60 @@ def create_poll():
     question = input("Enter the poll question: ").strip()
     options = [o.strip() for o in input("Enter options (comma separated): ").split(",") if o.strip()]
 
-    query = """
-        INSERT INTO polls (question, options, status, created_at)
-        VALUES (%s, %s, %s, %s);
-    """
-    execute_query(query, (question, options, "open", datetime.utcnow()))
-    print("✅ Poll created.")
+    if not question or len(options) < 2:
+        print("❌ A poll needs a question and at least two options.")
+        return
+
+    start = input("Opens on (YYYY-MM-DD, blank for now): ").strip()
+    end = input("Closes after (YYYY-MM-DD, blank for no end): ").strip()
+    try:
+        starts_at = datetime.combine(parse_date(start), datetime.min.time()) if start else None
+        ends_at = datetime.combine(parse_date(end), datetime.max.time()) if end else None
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    if starts_at and ends_at and ends_at <= starts_at:
+        print("❌ A poll must close after it opens.")
+        return
 
+    poll_id = insert_poll(question, options, starts_at, ends_at)
+    print(f"✅ Poll {poll_id} created.")
 
-def delete_all_polls():
-    confirm = input("⚠️ Are you sure you want to delete ALL polls? (yes/no): ")
-    if confirm.lower() == "yes":
-        execute_query("DELETE FROM polls;")
-        print("🗑️ Deleted all polls successfully.")
+
+def manage_polls():
+    print("\n🗳️ Close / Archive Polls")
+    print("1. Close a poll now")
+    print("2. Archive all closed polls")
+    choice = input("Choose: ").strip()
+    if choice == "1":
+        poll_id = input("Poll ID to close: ").strip()
+        if poll_id.isdigit() and close_poll(int(poll_id)):
+            print(f"🔒 Poll {poll_id} closed.")
+        else:
+            print("❌ No open poll with that ID.")
+    elif choice == "2":
+        confirm = input("⚠️ Archive ALL closed polls? (yes/no): ")
+        if confirm.lower() == "yes":
+            print(f"📦 Archived {archive_closed_polls()} closed poll(s).")
+        else:
+            print("❌ Cancelled. Polls were not archived.")
     else:
-        print("❌ Cancelled. Polls were not deleted.")
+        print("Invalid choice.")
 
 
 # ---------- AMENITY BOOKINGS ----------
 def list_pending_bookings():
     print("\n📅 Pending Amenity Bookings:")
-    query = "SELECT * FROM amenity_bookings WHERE status='pending';"
-    rows = execute_query(query, fetch=True)
-
-    if not rows:
+    # past-dated requests are listed too: until decided they still hold their slot
+    query = f"""
+        SELECT {columns(BookingRow)} FROM amenity_bookings
+        WHERE status='pending'
+        ORDER BY date, time;
+    """
+    with closing(stream_records(BookingRow, query, readonly=True)) as bookings:
+        shown = render_table(["ID", "Amenity", "Date", "Time", "Resident", "Status"], bookings)
+    if not shown:
         print("✅ No pending bookings.")
-        return
-
-    for b in rows:
-        print(f"- id:{b['id']} | amenity:{b['amenity']} | date:{b['date']} {b['time']} | resident:{b['resident_id']}")
 
 
 def decide_booking():
@@ -168,9 +161,21 @@ def decide_booking():
     if decision not in ("a", "r"):
         print("❌ Invalid choice.")
         return
+    if not bid.isdigit():
+        print("❌ Invalid booking id.")
+        return
     status = "approved" if decision == "a" else "rejected"
-    query = "UPDATE amenity_bookings SET status=%s WHERE id=%s;"
-    execute_query(query, (status, bid))
+    query = """
+        UPDATE amenity_bookings b SET status = %s
+        FROM (SELECT * FROM amenity_bookings WHERE id = %s FOR UPDATE) old
+        WHERE b.id = old.id AND b.date = old.date
+        RETURNING to_jsonb(old) AS before, to_jsonb(b) AS after;
+    """
+    decided = audited(f"{status}_booking", "amenity_bookings", "id", query, (status, int(bid)))
+    if not decided:
+        print("❌ No booking with that id.")
+        return
+    slot_occupancy.invalidate(decided[0]["after"]["amenity"])
     print("✅ Booking status updated.")
 
 
@@ -185,60 +190,82 @@ def view_and_assign_complaints():
         choice = input("Enter your choice: ").strip()
 
         if choice == "1":
-            complaints = execute_query("SELECT * FROM complaints;", fetch=True)
-            if not complaints:
+            with closing(stream_records(ComplaintRow, f"SELECT {columns(ComplaintRow)} FROM complaints ORDER BY id;",
+                                        readonly=True)) as complaints:
+                shown = render_table(["ID", "Flat No", "Category", "Description", "Status"],
+                                     ((c.id, c.flat_no, c.category, c.description, c.status) for c in complaints))
+            if not shown:
                 print("⚠️ No complaints found.")
                 continue
 
-            table = []
-            for idx, c in enumerate(complaints, 1):
-                table.append([idx, c['flat_no'], c['category'], c['description'], c['status']])
-            print(tabulate(table, headers=["No.", "Flat No", "Category", "Description", "Status"], tablefmt="grid"))
-
-            choice = input("\nEnter complaint number to assign (or 'q' to cancel): ").strip()
+            choice = input("\nEnter complaint ID to assign (or 'q' to cancel): ").strip()
             if choice.lower() == 'q':
                 continue
 
-            idx = int(choice) - 1
-            if idx < 0 or idx >= len(complaints):
+            found = fetch_records(ComplaintRow, f"SELECT {columns(ComplaintRow)} FROM complaints WHERE id = %s;",
+                                  (choice,)) if choice.isdigit() else []
+            if not found:
                 print("⚠️ Invalid choice.")
                 continue
 
-            selected_complaint = complaints[idx]
+            selected_complaint = found[0]
             assigned_to = input("👷 Assign to (staff username): ").strip()
             due_date = input("📅 Due Date (YYYY-MM-DD): ").strip()
+            try:
+                assignment = TaskAssignment.parse(selected_complaint.id, assigned_to, due_date)
+            except ValidationError as e:
+                print(f"❌ {e}")
+                continue
 
+            # the complaint moves to Assigned only if nobody changed it since it was shown,
+            # and the task is created from the same statement so both happen or neither does
             query_task = """
-                INSERT INTO maintenance_tasks (flat_no, issue, assigned_to, status, created_at, due_date, source_complaint_id)
-                VALUES (%s, %s, %s, %s, %s, %s, %s);
+                WITH old AS (
+                    SELECT * FROM complaints WHERE id = %s FOR UPDATE
+                ), c AS (
+                    UPDATE complaints cm SET status = %s, version = cm.version + 1, updated_at = LOCALTIMESTAMP
+                    FROM old
+                    WHERE cm.id = old.id AND cm.version = %s AND cm.status = ANY(%s)
+                    RETURNING cm.id, cm.flat_no, cm.description, to_jsonb(old) AS before, to_jsonb(cm) AS after
+                ), t AS (
+                    INSERT INTO maintenance_tasks (flat_no, issue, assigned_to, status, created_at, due_date, source_complaint_id)
+                    SELECT c.flat_no, c.description, %s, %s, LOCALTIMESTAMP, %s, c.id FROM c
+                    RETURNING *
+                )
+                SELECT c.before, c.after, to_jsonb(t) AS task FROM c JOIN t ON t.source_complaint_id = c.id;
             """
-            execute_query(query_task, (
-                selected_complaint['flat_no'], selected_complaint['description'],
-                assigned_to, "Pending", datetime.utcnow(), due_date, selected_complaint['id']
-            ))
-
-            execute_query("UPDATE complaints SET status='Assigned' WHERE id=%s;", (selected_complaint['id'],))
+            created = execute_query(query_task, (
+                assignment.complaint_id, ComplaintStatus.ASSIGNED.value, selected_complaint.version,
+                allowed_sources(COMPLAINT_TRANSITIONS, ComplaintStatus.ASSIGNED),
+                assignment.assigned_to, TaskStatus.PENDING.value, assignment.due_date
+            ), fetch=True)
+            if not created:
+                print(f"⚠️ Complaint {assignment.complaint_id} was changed by someone else or is already assigned.")
+                continue
+            row = created[0]
+            record("assign_complaint", f"complaints/{assignment.complaint_id}", row["before"], row["after"])
+            record("create_task", f"maintenance_tasks/{row['task']['id']}", after=row["task"])
             print("✅ Task assigned.\n")
 
         elif choice == "2":
-            tasks = execute_query("SELECT * FROM maintenance_tasks;", fetch=True)
-            if not tasks:
+            with closing(stream_records(TaskRow, f"SELECT {columns(TaskRow)} FROM maintenance_tasks ORDER BY id;",
+                                        readonly=True)) as tasks:
+                shown = render_table(["Task ID", "Flat No", "Issue", "Assigned To", "Status"],
+                                     ((t.id, t.flat_no, t.issue or t.task_name, t.assigned_to, t.status) for t in tasks))
+            if not shown:
                 print("⚠️ No tasks found to remove.")
                 continue
 
-            table = [[i + 1, t['id'], t['flat_no'], t['issue'], t['assigned_to'], t['status']] for i, t in enumerate(tasks)]
-            print(tabulate(table, headers=["No.", "Task ID", "Flat No", "Issue", "Assigned To", "Status"], tablefmt="grid"))
-
-            choice = input("\nEnter task number to remove (or 'q' to cancel): ").strip()
+            choice = input("\nEnter task ID to remove (or 'q' to cancel): ").strip()
             if choice.lower() == 'q':
                 continue
-            idx = int(choice) - 1
-            if idx < 0 or idx >= len(tasks):
+            removed = audited("remove_task", "maintenance_tasks", "id", """
+                DELETE FROM maintenance_tasks t WHERE id = %s
+                RETURNING to_jsonb(t) AS before, NULL::jsonb AS after;
+            """, (int(choice),)) if choice.isdigit() else None
+            if not removed:
                 print("⚠️ Invalid choice.")
                 continue
-
-            task_to_remove = tasks[idx]
-            execute_query("DELETE FROM maintenance_tasks WHERE id=%s;", (task_to_remove['id'],))
             print("🗑️ Task removed successfully.\n")
 
         elif choice == "3":
@@ -252,30 +279,55 @@ def view_and_assign_complaints():
 def post_announcement():
     print("\n📢 Post Announcement")
     msg = input("Message: ").strip()
-    execute_query("INSERT INTO announcements (message, created_at) VALUES (%s, %s);", (msg, datetime.utcnow()))
+    expiry = input("Expires on (YYYY-MM-DD, blank for never): ").strip()
+    expires_at = None
+    if expiry:
+        try:
+            expires_at = datetime.strptime(expiry, "%Y-%m-%d").replace(hour=23, minute=59, second=59)
+        except ValueError:
+            print("❌ Invalid date format. Use YYYY-MM-DD.")
+            return
+    pinned = input("Pin this announcement? (yes/no): ").strip().lower() == "yes"
+    add_announcement(msg, expires_at, pinned)
     print("✅ Announcement posted.")
 
 
 def delete_announcement():
     print("\n🗑️ Delete an Announcement by ID")
-    announcements = execute_query("SELECT * FROM announcements ORDER BY created_at DESC LIMIT 10;", fetch=True)
+    announcements = list_active()
     if not announcements:
         print("No announcements to delete.")
         return
     for a in announcements:
-        print(f"- ID: {a['id']} | Message: {a['message']}")
+        pin = "📌 " if a['pinned'] else ""
+        print(f"- ID: {a['id']} | {pin}Message: {a['message']}")
     ann_id = input("\nEnter the ID to delete: ").strip()
-    execute_query("DELETE FROM announcements WHERE id=%s;", (ann_id,))
+    deleted = audited("delete_announcement", "announcements", "id", """
+        DELETE FROM announcements a WHERE id = %s
+        RETURNING to_jsonb(a) AS before, NULL::jsonb AS after;
+    """, (int(ann_id),)) if ann_id.isdigit() else None
+    if not deleted:
+        print("❌ No announcement with that ID.")
+        return
     print("✅ Announcement deleted.")
 
 
+def archive_announcements():
+    moved = archive_expired()
+    print(f"📦 Archived {moved} expired announcement(s).")
+
+
 # ---------- SKIP DELIVERY ----------
 def view_skips_by_date():
     d = input("Enter date (YYYY-MM-DD) or leave blank for today: ").strip() or datetime.now().strftime("%Y-%m-%d")
     svc = input("Service (milk/water/newspaper): ").strip().lower()
-    print(f"\n🚚 Skips for {svc} on {d}:")
-    query = "SELECT flat_no FROM skip_delivery WHERE skip_date=%s AND item=%s;"
-    skips = execute_query(query, (d, svc), fetch=True)
+    try:
+        q = SkipQuery.parse(d, svc)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    print(f"\n🚚 Skips for {q.item} on {q.skip_date}:")
+    skips = execute_prepared("skips_for_day", (q.skip_date, q.item.value), readonly=True)
     if skips:
         for s in skips:
             print(f"- Flat {s['flat_no']}")
@@ -285,27 +337,62 @@ def view_skips_by_date():
 
 # ---------- POLL SUMMARY ----------
 def view_poll_summary():
-    polls = execute_query("SELECT * FROM polls;", fetch=True)
-    if not polls:
+    rows = poll_results()
+    if not rows:
         print("\n📊 No polls found.")
         return
     print("\n📊 === Poll Summary ===")
-    for poll in polls:
-        print(f"\n🗳️ Question: {poll['question']}")
-        print(f" Options: {poll['options']}")
+    current = None
+    for r in rows:
+        if r['id'] != current:
+            current = r['id']
+            closes = f", closes {r['ends_at']:%Y-%m-%d %H:%M}" if r['ends_at'] and r['status'] == 'open' else ""
+            print(f"\n🗳️ Poll {r['id']}: {r['question']} ({r['status']}{closes})")
+        print(f"   - {r['label']}: {r['votes']} vote(s)")
+
+
+# ---------- OUTPUT FORMAT ----------
+def choose_output_format():
+    fmt = input(f"Output format ({'/'.join(FORMATS)}): ").strip().lower()
+    try:
+        set_default_format(fmt)
+        print(f"✅ Listings will be shown as {fmt}.")
+    except ValueError as e:
+        print(f"❌ {e}")
+
+
+# ---------- SOCIETIES ----------
+def add_society():
+    print("\n🏢 Add Society")
+    code = input("Society code (e.g. greenpark): ").strip()
+    name = input("Society name: ").strip()
+    try:
+        schema = create_society(code, name or code)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    except Exception as e:
+        print("❌ Could not create society:", e)
+        return
+
+    # the feature tables, triggers and default admin/staff logins the society needs before anyone signs in
+    try:
+        migrate_society(schema)
+    except Exception as e:
+        print("❌ Society created but its setup failed; run `python migrations.py` to finish it:", e)
+        return
+    print(f"✅ Society '{code}' created. Its admin can now log in.")
 
 
 # ---------- MAIN MENU ----------
 def admin_menu():
-    seed_admin()
-    seed_staff()
     while True:
         print("\n=== Admin Menu ===")
         print("1. List pending residents")
         print("2. Approve resident by ID")
         print("3. Assign common task")
         print("4. Create poll")
-        print("5. Delete all polls")
+        print("5. Close / archive polls")
         print("6. List pending amenity bookings")
         print("7. Decide booking (approve/reject)")
         print("8. View and Assign maintenance task")
@@ -313,20 +400,47 @@ def admin_menu():
         print("10. Delete announcements")
         print("11. View skips by date/service")
         print("12. View poll summary")
-        print("13. Back")
+        print("13. Archive expired announcements")
+        print("14. Rotate data partitions (complaints/skips/bookings)")
+        print("15. Society dashboard")
+        print("16. Maintenance SLA / overdue report")
+        print("17. Query statistics")
+        print("18. Set listing output format (table/json/csv)")
+        print("19. Add society")
+        print("20. Delivery reconciliation report")
+        print("21. Run monthly billing")
+        print("22. Complaint analytics")
+        print("23. Search residents")
+        print("24. Audit log")
+        print("25. Back")
 
         ch = input("Choose: ").strip()
-        if ch == "1": list_pending_residents()
-        elif ch == "2": approve_resident_by_id(input("Resident ID: ").strip())
-        elif ch == "3": assign_common_task()
-        elif ch == "4": create_poll()
-        elif ch == "5": delete_all_polls()
-        elif ch == "6": list_pending_bookings()
-        elif ch == "7": decide_booking()
-        elif ch == "8": view_and_assign_complaints()
-        elif ch == "9": post_announcement()
-        elif ch == "10": delete_announcement()
-        elif ch == "11": view_skips_by_date()
-        elif ch == "12": view_poll_summary()
-        elif ch == "13": break
-        else: print("Invalid choice.")
+        try:
+            if ch == "1": list_pending_residents()
+            elif ch == "2": approve_resident_by_id(input("Resident ID: ").strip())
+            elif ch == "3": assign_common_task()
+            elif ch == "4": create_poll()
+            elif ch == "5": manage_polls()
+            elif ch == "6": list_pending_bookings()
+            elif ch == "7": decide_booking()
+            elif ch == "8": view_and_assign_complaints()
+            elif ch == "9": post_announcement()
+            elif ch == "10": delete_announcement()
+            elif ch == "11": view_skips_by_date()
+            elif ch == "12": view_poll_summary()
+            elif ch == "13": archive_announcements()
+            elif ch == "14": rotate_partitions()
+            elif ch == "15": view_society_dashboard()
+            elif ch == "16": view_sla_report()
+            elif ch == "17": view_query_stats()
+            elif ch == "18": choose_output_format()
+            elif ch == "19": add_society()
+            elif ch == "20": view_reconciliation()
+            elif ch == "21": billing_run_flow()
+            elif ch == "22": view_complaint_analytics()
+            elif ch == "23": search_residents_flow()
+            elif ch == "24": view_audit_log()
+            elif ch == "25": break
+            else: print("Invalid choice.")
+        except (DatabaseUnavailable, psycopg2.OperationalError) as e:
+            print(f"⚠️ {e}")
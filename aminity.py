@@ -1,78 +1,273 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime, date
-
-
-# ---------- DATABASE CONNECTION ----------
-def get_db():
-    """Connect to PostgreSQL database."""
-    return psycopg2.connect(
-        host="localhost",      # change this to your PostgreSQL host
-        database="society_db", # change this to your database name
-        user="postgres",       # change this to your username
-        password="admin",      # change this to your password
-        port=5432
-    )
-
-
-# ---------- HELPER FUNCTION ----------
-def execute_query(query, params=None, fetch=False):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute(query, params)
-        if fetch:
-            data = cur.fetchall()
-        else:
-            data = None
-        conn.commit()
-        return data
-    finally:
-        cur.close()
-        conn.close()
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import config
+from db import execute_query, current_tenant
+from outbox import outbox
+from output import render_table
+from models import AmenityBooking, BookingStatus, ValidationError, parse_time
+
+
+# bookings that hold a place in their slot
+HOLDING_STATUSES = (BookingStatus.PENDING.value, BookingStatus.APPROVED.value)
+
+# name, capacity (bookings per slot), slot length in minutes, opening hours, fee per approved booking
+DEFAULT_AMENITIES = [
+    ("Clubhouse", 1, 240, "09:00", "22:00", 500.00),
+    ("Tennis Court", 1, 60, "06:00", "21:00", 200.00),
+    ("Gym", 15, 60, "05:00", "23:00", 100.00),
+]
+
+WEEK_DAYS = 7
+
+Amenity = namedtuple("Amenity", "name capacity slot_minutes opens_at closes_at")
+
+
+# ---------- SCHEMA ----------
+def ensure_amenity_catalogue():
+    """Add capacity, slot length, opening hours and fee to amenities and seed the defaults."""
+    execute_query("""
+        ALTER TABLE amenities
+            ADD COLUMN IF NOT EXISTS capacity INTEGER NOT NULL DEFAULT 1 CHECK (capacity > 0),
+            ADD COLUMN IF NOT EXISTS slot_minutes INTEGER NOT NULL DEFAULT 60 CHECK (slot_minutes > 0),
+            ADD COLUMN IF NOT EXISTS opens_at TIME NOT NULL DEFAULT '06:00',
+            ADD COLUMN IF NOT EXISTS closes_at TIME NOT NULL DEFAULT '22:00',
+            ADD COLUMN IF NOT EXISTS fee NUMERIC(10, 2) CHECK (fee >= 0);
+    """)
+    execute_query("""
+        INSERT INTO amenities (name, capacity, slot_minutes, opens_at, closes_at, fee)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (name) DO NOTHING;
+    """, DEFAULT_AMENITIES, many=True)
+    # amenities from before the fee column keep the rates billing used to hard-code;
+    # any other amenity is free until an admin prices it
+    execute_query("UPDATE amenities SET fee = %s WHERE name = %s AND fee IS NULL;",
+                  [(a[5], a[0]) for a in DEFAULT_AMENITIES], many=True)
+    execute_query("UPDATE amenities SET fee = 0 WHERE fee IS NULL;")
+    execute_query("ALTER TABLE amenities ALTER COLUMN fee SET DEFAULT 0, ALTER COLUMN fee SET NOT NULL;")
+    # `time` is free text on older bookings; slot_start is the slot it falls in, the
+    # one value the capacity check and the slot counts both compare
+    execute_query("ALTER TABLE amenity_bookings ADD COLUMN IF NOT EXISTS slot_start TIME;")
+    _backfill_slot_starts()
+    # counting a slot's bookings is an index lookup, not a scan of the day
+    execute_query("DROP INDEX IF EXISTS idx_amenity_bookings_slot;")
+    execute_query("""
+        CREATE INDEX IF NOT EXISTS idx_amenity_bookings_slot_start ON amenity_bookings (amenity, date, slot_start);
+    """)
+
+
+def _backfill_slot_starts():
+    """Set slot_start on bookings saved before it existed; times that do not parse stay NULL."""
+    rows = execute_query("""
+        SELECT DISTINCT amenity, time FROM amenity_bookings WHERE slot_start IS NULL AND time IS NOT NULL;
+    """, fetch=True)
+    catalogue = amenity_catalogue()
+    updates = []
+    for r in rows:
+        amenity = catalogue.get(r["amenity"])
+        try:
+            start = amenity and slot_for(amenity, parse_time(r["time"]))
+        except ValidationError:
+            start = None
+        if start is not None:
+            updates.append((start, r["amenity"], r["time"]))
+    if updates:
+        execute_query("""
+            UPDATE amenity_bookings SET slot_start = %s
+            WHERE amenity = %s AND time = %s AND slot_start IS NULL;
+        """, updates, many=True)
+
+
+# ---------- CATALOGUE ----------
+_catalogue = {}
+_catalogue_lock = threading.Lock()
+
+
+def amenity_catalogue():
+    """Amenities of the current society by name, cached for cache_ttl("amenities") seconds."""
+    schema = current_tenant()
+    with _catalogue_lock:
+        cached = _catalogue.get(schema)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+    rows = execute_query("""
+        SELECT name, capacity, slot_minutes, opens_at, closes_at FROM amenities ORDER BY name;
+    """, fetch=True, readonly=True)
+    amenities = {r["name"]: Amenity(**r) for r in rows}
+    with _catalogue_lock:
+        _catalogue[schema] = (time.monotonic() + config.cache_ttl("amenities"), amenities)
+    return amenities
+
+
+def slot_starts(amenity):
+    """Start times of every slot that ends by closing time."""
+    day = date.min
+    start = datetime.combine(day, amenity.opens_at)
+    close = datetime.combine(day, amenity.closes_at)
+    length = timedelta(minutes=amenity.slot_minutes)
+    starts = []
+    while start + length <= close:
+        starts.append(start.time())
+        start += length
+    return starts
+
+
+def slot_for(amenity, at):
+    """The start of the slot containing `at`, or None outside opening hours."""
+    opens = amenity.opens_at.hour * 60 + amenity.opens_at.minute
+    minute = at.hour * 60 + at.minute
+    starts = slot_starts(amenity)
+    index = (minute - opens) // amenity.slot_minutes
+    return starts[index] if minute >= opens and index < len(starts) else None
+
+
+# ---------- SLOT OCCUPANCY ----------
+class SlotOccupancy:
+    """Places taken per amenity, day and slot, held in memory.
+
+    Days are loaded a week at a time with one grouped query and kept for
+    cache_ttl("slots") seconds, which is short so bookings and decisions made
+    on other terminals show up quickly. A booking made on this terminal is
+    counted straight away, and an approval or rejection here drops the
+    amenity's days so they are reloaded. The database insert checks capacity
+    again under a lock, so a stale count here never lets a slot be overbooked.
+    """
+
+    def __init__(self):
+        self.days = {}      # (schema, amenity, day) -> (expires, {slot start: places taken})
+        self.lock = threading.Lock()
+
+    def _load(self, first, last):
+        catalogue = amenity_catalogue()
+        rows = execute_query("""
+            SELECT amenity, date, slot_start, count(*) AS taken FROM amenity_bookings
+            WHERE date BETWEEN %s AND %s AND status = ANY(%s) AND slot_start IS NOT NULL
+            GROUP BY amenity, date, slot_start;
+        """, (first, last, list(HOLDING_STATUSES)), fetch=True, readonly=True)
+        schema = current_tenant()
+        expires = time.monotonic() + config.cache_ttl("slots")
+        loaded = {(schema, name, first + timedelta(days=n)): {}
+                  for name in catalogue for n in range((last - first).days + 1)}
+        for r in rows:
+            taken = loaded.get((schema, r["amenity"], r["date"]))
+            if taken is not None:
+                taken[r["slot_start"]] = r["taken"]
+        with self.lock:
+            for key, taken in loaded.items():
+                self.days[key] = (expires, taken)
+
+    def day(self, amenity_name, day):
+        """{slot start: places taken} for one amenity and day."""
+        key = (current_tenant(), amenity_name, day)
+        with self.lock:
+            cached = self.days.get(key)
+        if not cached or cached[0] <= time.monotonic():
+            self._load(day, day + timedelta(days=WEEK_DAYS - 1))
+            with self.lock:
+                cached = self.days.get(key, (0, {}))
+        return cached[1]
+
+    def add(self, amenity_name, day, start):
+        with self.lock:
+            cached = self.days.get((current_tenant(), amenity_name, day))
+            if cached:
+                cached[1][start] = cached[1].get(start, 0) + 1
+
+    def invalidate(self, amenity_name):
+        schema = current_tenant()
+        with self.lock:
+            for key in [k for k in self.days if k[0] == schema and k[1] == amenity_name]:
+                del self.days[key]
+
+
+slot_occupancy = SlotOccupancy()
+
+
+def free_slots(amenity, day):
+    """[(slot start, places left)] for slots with room, skipping ones already started today."""
+    taken = slot_occupancy.day(amenity.name, day)
+    now = datetime.now()
+    return [(start, amenity.capacity - taken.get(start, 0)) for start in slot_starts(amenity)
+            if taken.get(start, 0) < amenity.capacity and datetime.combine(day, start) > now]
 
 
 # ---------- AMENITY SELECTION ----------
 def select_amenity():
-    print("\n📋 Available Amenities:")
-    print("1. Clubhouse")
-    print("2. Tennis Court")
-    print("3. Gym")
-
-    choice = input("Select an amenity by number (1-3): ").strip()
-
-    if choice == "1":
-        return "Clubhouse"
-    elif choice == "2":
-        return "Tennis Court"
-    elif choice == "3":
-        return "Gym"
-    else:
-        print("❌ Invalid choice.")
+    amenities = list(amenity_catalogue().values())
+    if not amenities:
+        print("ℹ️ No amenities are set up yet.")
         return None
 
+    print("\n📋 Available Amenities:")
+    for n, a in enumerate(amenities, 1):
+        print(f"{n}. {a.name} ({a.opens_at:%H:%M}-{a.closes_at:%H:%M}, "
+              f"{a.slot_minutes}-minute slots, {a.capacity} per slot)")
 
-# ---------- BOOK AMENITY ----------
-def book_amenity(resident_id, amenity_name, booking_date_str, booking_time):
-    """Book an amenity for a resident."""
-    try:
-        booking_date = datetime.strptime(booking_date_str, "%Y-%m-%d").date()
-        if booking_date < date.today():
-            print("⚠️ That date has already passed. Please choose a future date.")
-            return
-    except ValueError:
-        print("❌ Invalid date format. Use YYYY-MM-DD.")
+    choice = input(f"Select an amenity by number (1-{len(amenities)}): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(amenities):
+        return amenities[int(choice) - 1].name
+    print("❌ Invalid choice.")
+    return None
+
+
+def print_free_slots(amenity_name, day):
+    amenity = amenity_catalogue()[amenity_name]
+    slots = free_slots(amenity, day)
+    if not slots:
+        print(f"ℹ️ {amenity_name} has no free slots on {day}.")
         return
+    print(f"🕒 Free {amenity_name} slots on {day}: "
+          + ", ".join(f"{start:%H:%M} ({left} left)" for start, left in slots))
+
+
+def view_free_slots():
+    """Free places per amenity for the next seven days."""
+    amenities = amenity_catalogue().values()
+    today = date.today()
+    print("\n📅 Free Amenity Slots This Week")
+    rows = []
+    for amenity in amenities:
+        for n in range(WEEK_DAYS):
+            day = today + timedelta(days=n)
+            slots = free_slots(amenity, day)
+            rows.append((amenity.name, f"{day:%a %d %b}",
+                         ", ".join(f"{start:%H:%M}" for start, _ in slots) or "no free slots"))
+    if not render_table(["Amenity", "Day", "Free slots"], rows):
+        print("ℹ️ No amenities are set up yet.")
+
 
-    query = """
-        INSERT INTO amenity_bookings (resident_id, amenity, date, time, status)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING id;
+# ---------- BOOK AMENITY ----------
+def book_amenity(resident_id, amenity_name, booking_date_str, booking_time, idempotency_key=None):
+    """Queue a booking request for a resident and return its idempotency key.
+
+    The time must fall in one of the amenity's slots that has not started yet
+    and the slot must have a free place. The request is saved on this terminal and sent to the database
+    in the background, where capacity is checked again; calling again with the
+    same idempotency_key does not add a second booking.
     """
-    result = execute_query(query, (resident_id, amenity_name, str(booking_date), booking_time, "pending"), fetch=True)
+    try:
+        booking = AmenityBooking.parse(resident_id, amenity_name, booking_date_str, booking_time)
+        amenity = amenity_catalogue().get(booking.amenity)
+        if amenity is None:
+            raise ValidationError(f"Unknown amenity '{booking.amenity}'.")
+        start = slot_for(amenity, parse_time(booking.time))
+        if start is None:
+            raise ValidationError(f"{amenity.name} is open {amenity.opens_at:%H:%M}-{amenity.closes_at:%H:%M}.")
+        if datetime.combine(booking.date, start) <= datetime.now():
+            raise ValidationError(f"The {start:%H:%M} {amenity.name} slot on {booking.date} has already started.")
+        if slot_occupancy.day(amenity.name, booking.date).get(start, 0) >= amenity.capacity:
+            raise ValidationError(f"The {start:%H:%M} {amenity.name} slot on {booking.date} is full.")
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return None
+
+    key = outbox().enqueue("booking", {
+        "resident_id": booking.resident_id, "amenity": amenity.name, "date": booking.date,
+        "time": f"{start:%H:%M}", "status": BookingStatus.PENDING.value,
+    }, idempotency_key)
+    slot_occupancy.add(amenity.name, booking.date, start)
+    print(f"✅ {amenity_name} booking request submitted for the {start:%H:%M} slot.")
+    return key
 
-    if result:
-        print(f"✅ {amenity_name} booking request submitted.")
-        print(f"🆔 Your Booking ID: {result[0]['id']}")
-    else:
-        print("⚠️ Failed to create booking.")
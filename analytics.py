@@ -0,0 +1,186 @@
+import threading
+import time
+from datetime import date, timedelta
+
+import config
+from db import get_db, execute_query, current_tenant
+from output import render_table
+
+
+REPORT_WEEKS = 12           # history shown in the trend report
+REPEAT_WINDOW_DAYS = 90     # same flat + category this often counts as a repeat
+
+
+# ---------- SCHEMA ----------
+def ensure_analytics_schema():
+    """Create the per-day complaint rollup and the index used to find changed days."""
+    execute_query("ALTER TABLE complaints ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;")
+    # stamped by the server, like the refresh watermark it is compared with
+    execute_query("ALTER TABLE complaints ALTER COLUMN updated_at SET DEFAULT LOCALTIMESTAMP;")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_complaints_updated_at ON complaints (updated_at);")
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS complaint_daily (
+            day DATE NOT NULL,
+            category TEXT NOT NULL,
+            tower TEXT NOT NULL,
+            opened INTEGER NOT NULL,
+            resolved INTEGER NOT NULL,
+            PRIMARY KEY (day, category, tower)
+        );
+    """)
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS complaint_rollup_state (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            refreshed_at TIMESTAMP NOT NULL
+        );
+    """)
+
+
+# ---------- ROLLUP ----------
+def refresh_rollup():
+    """Recompute complaint_daily for days whose complaints changed since the last refresh.
+
+    New complaints are dated today and stamped with updated_at on insert, and
+    status changes restamp it from the server clock, so only those days are regrouped. The first refresh builds the whole rollup.
+    Returns the number of days recomputed.
+    """
+    conn = get_db()
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT refreshed_at FROM complaint_rollup_state FOR UPDATE;")
+        row = cur.fetchone()
+        since = row[0] if row else None
+        cur.execute("SELECT LOCALTIMESTAMP;")
+        now = cur.fetchone()[0]
+
+        cur.execute("""
+            CREATE TEMP TABLE dirty_days ON COMMIT DROP AS
+            SELECT DISTINCT date AS day FROM complaints
+            WHERE %(since)s::timestamp IS NULL
+               OR date >= %(since)s::date
+               OR updated_at > %(since)s::timestamp;
+        """, {"since": since})
+        cur.execute("DELETE FROM complaint_daily WHERE day IN (SELECT day FROM dirty_days);")
+        cur.execute("""
+            INSERT INTO complaint_daily (day, category, tower, opened, resolved)
+            SELECT c.date, COALESCE(c.category, '-'), COALESCE(rt.tower, '-'),
+                   count(*), count(*) FILTER (WHERE c.status = 'Resolved')
+            FROM complaints c
+            LEFT JOIN flat_routes rt ON rt.flat_no = c.flat_no
+            WHERE c.date IN (SELECT day FROM dirty_days)
+            GROUP BY 1, 2, 3;
+        """)
+        cur.execute("SELECT count(*) FROM dirty_days;")
+        days = cur.fetchone()[0]
+        cur.execute("""
+            INSERT INTO complaint_rollup_state (id, refreshed_at) VALUES (TRUE, %s)
+            ON CONFLICT (id) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at;
+        """, (now,))
+        conn.commit()
+        return days
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ---------- REPORT ----------
+BY_CATEGORY = """
+    SELECT category, sum(opened) AS opened, sum(resolved) AS resolved,
+           round(100.0 * sum(resolved) / NULLIF(sum(opened), 0), 1) AS resolution_rate
+    FROM complaint_daily WHERE day >= %(start)s
+    GROUP BY category ORDER BY opened DESC;
+"""
+
+BY_TOWER = """
+    SELECT tower, sum(opened) AS opened, sum(resolved) AS resolved,
+           round(100.0 * sum(resolved) / NULLIF(sum(opened), 0), 1) AS resolution_rate
+    FROM complaint_daily WHERE day >= %(start)s
+    GROUP BY tower ORDER BY opened DESC;
+"""
+
+BY_WEEK = """
+    SELECT week, opened, resolved, opened - lag(opened) OVER (ORDER BY week) AS change
+    FROM (
+        SELECT date_trunc('week', day)::date AS week, sum(opened) AS opened, sum(resolved) AS resolved
+        FROM complaint_daily WHERE day >= %(start)s
+        GROUP BY 1
+    ) w
+    ORDER BY week;
+"""
+
+REPEAT_FLATS = """
+    SELECT flat_no, category, complaints, latest
+    FROM (
+        SELECT flat_no, category, count(*) AS complaints, max(date) AS latest,
+               rank() OVER (ORDER BY count(*) DESC) AS position
+        FROM complaints WHERE date >= CURRENT_DATE - %(window)s
+        GROUP BY flat_no, category
+        HAVING count(*) > 1
+    ) r
+    WHERE position <= 20
+    ORDER BY complaints DESC, latest DESC;
+"""
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def complaint_report():
+    """Category, tower and weekly trends plus repeat flats, cached per society.
+
+    A cached report is reused for cache_ttl("analytics") seconds and never past
+    the day it was built for; after that the rollup is refreshed first.
+
+    It reads only the rollup (days x categories x towers) and a bounded window of
+    recent complaints, so its cost does not grow with the full history.
+    """
+    key = (current_tenant(), date.today())
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+    refresh_rollup()
+    params = {"start": date.today() - timedelta(weeks=REPORT_WEEKS), "window": REPEAT_WINDOW_DAYS}
+    report = {
+        "categories": execute_query(BY_CATEGORY, params, fetch=True, readonly=True),
+        "towers": execute_query(BY_TOWER, params, fetch=True, readonly=True),
+        "weeks": execute_query(BY_WEEK, params, fetch=True, readonly=True),
+        "repeats": execute_query(REPEAT_FLATS, params, fetch=True, readonly=True),
+    }
+    with _cache_lock:
+        # drop other days' entries so the cache holds at most one report per society
+        for old in [k for k in _cache if k[1] != key[1]]:
+            del _cache[old]
+        _cache[key] = (time.monotonic() + config.cache_ttl("analytics"), report)
+    return report
+
+
+def _rate(row):
+    return "-" if row['resolution_rate'] is None else f"{row['resolution_rate']}%"
+
+
+def view_complaint_analytics():
+    report = complaint_report()
+    if not report["categories"]:
+        print("ℹ️ No complaints in the last weeks.")
+        return
+
+    print(f"\n📊 Complaint Analytics (last {REPORT_WEEKS} weeks)")
+    print("\nBy category")
+    render_table(["Category", "Opened", "Resolved", "Resolved %"],
+                 ((r['category'], r['opened'], r['resolved'], _rate(r)) for r in report["categories"]))
+    print("\nBy tower")
+    render_table(["Tower", "Opened", "Resolved", "Resolved %"],
+                 ((r['tower'], r['opened'], r['resolved'], _rate(r)) for r in report["towers"]))
+    print("\nBy week")
+    render_table(["Week of", "Opened", "Resolved", "Change"],
+                 ((r['week'], r['opened'], r['resolved'], "-" if r['change'] is None else f"{r['change']:+d}")
+                  for r in report["weeks"]))
+    print(f"\nRepeat complaints (last {REPEAT_WINDOW_DAYS} days)")
+    if not render_table(["Flat", "Category", "Complaints", "Latest"],
+                        ((r['flat_no'], r['category'], r['complaints'], r['latest']) for r in report["repeats"])):
+        print("✅ No flat has repeated a complaint category.")
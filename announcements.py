@@ -0,0 +1,109 @@
+from db import execute_query
+from audit import audited
+
+
+FEED_LIMIT = 20
+ADMIN_LIST_LIMIT = 10
+
+
+# ---------- SCHEMA ----------
+def ensure_announcement_schema():
+    """Add expiry/pinning columns, the created_at index and the archive tables."""
+    execute_query("""
+        ALTER TABLE announcements
+            ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS pinned BOOLEAN NOT NULL DEFAULT FALSE;
+    """)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_announcements_created_at ON announcements (created_at DESC);")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_announcements_pinned ON announcements (created_at DESC) WHERE pinned;")
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS announcements_archive (
+            LIKE announcements,
+            archived_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        );
+    """)
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS announcement_reads (
+            resident_id TEXT PRIMARY KEY,
+            last_seen_at TIMESTAMP NOT NULL
+        );
+    """)
+
+
+# ---------- POST ----------
+def add_announcement(message, expires_at=None, pinned=False):
+    query = """
+        INSERT INTO announcements AS a (message, created_at, expires_at, pinned)
+        VALUES (%s, LOCALTIMESTAMP, %s, %s)
+        RETURNING NULL::jsonb AS before, to_jsonb(a) AS after;
+    """
+    audited("post_announcement", "announcements", "id", query, (message, expires_at, pinned))
+
+
+# ---------- FEED ----------
+def fetch_feed(resident_id, limit=FEED_LIMIT):
+    """Return live pinned items plus up to `limit` announcements the resident has not seen.
+
+    Unseen rows are taken oldest first and the read marker is advanced, in the
+    same statement, to the newest of them, so anything beyond the limit is
+    returned by the next call rather than skipped.
+    """
+    query = """
+        WITH prev AS (
+            SELECT COALESCE(
+                (SELECT last_seen_at FROM announcement_reads WHERE resident_id = %(rid)s), '-infinity'
+            ) AS seen
+        ),
+        unseen AS (
+            SELECT id, message, created_at, pinned
+            FROM announcements
+            WHERE (expires_at IS NULL OR expires_at > LOCALTIMESTAMP)
+              AND created_at > (SELECT seen FROM prev)
+            ORDER BY created_at, id
+            LIMIT %(limit)s
+        ),
+        mark AS (
+            INSERT INTO announcement_reads (resident_id, last_seen_at)
+            SELECT %(rid)s, max(created_at) FROM unseen HAVING max(created_at) IS NOT NULL
+            ON CONFLICT (resident_id) DO UPDATE SET last_seen_at = EXCLUDED.last_seen_at
+        )
+        SELECT * FROM unseen
+        UNION ALL
+        (SELECT id, message, created_at, pinned
+         FROM announcements
+         WHERE pinned
+           AND (expires_at IS NULL OR expires_at > LOCALTIMESTAMP)
+           AND created_at <= (SELECT seen FROM prev)
+         ORDER BY created_at DESC
+         LIMIT %(limit)s)
+        ORDER BY pinned DESC, created_at DESC;
+    """
+    return execute_query(query, {"rid": resident_id, "limit": limit}, fetch=True)
+
+
+def list_active(limit=ADMIN_LIST_LIMIT):
+    query = """
+        SELECT id, message, created_at, pinned, expires_at
+        FROM announcements
+        WHERE expires_at IS NULL OR expires_at > LOCALTIMESTAMP
+        ORDER BY pinned DESC, created_at DESC
+        LIMIT %s;
+    """
+    return execute_query(query, (limit,), fetch=True, readonly=True)
+
+
+# ---------- ARCHIVAL ----------
+def archive_expired():
+    """Move expired announcements into announcements_archive; return how many moved."""
+    query = """
+        WITH moved AS (
+            DELETE FROM announcements
+            WHERE expires_at <= LOCALTIMESTAMP
+            RETURNING *
+        ), archived AS (
+            INSERT INTO announcements_archive (id, message, created_at, expires_at, pinned, archived_at)
+            SELECT id, message, created_at, expires_at, pinned, LOCALTIMESTAMP FROM moved
+        )
+        SELECT to_jsonb(moved) AS before, NULL::jsonb AS after FROM moved;
+    """
+    return len(audited("archive_announcement", "announcements", "id", query))
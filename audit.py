@@ -0,0 +1,149 @@
+import json
+import threading
+from datetime import timedelta
+
+from psycopg2.extras import Json
+
+from buffered import BufferedWriter
+from db import execute_query, ensure_trigger
+from output import render_table
+from models import ValidationError, parse_date
+
+
+AUDIT_LIMIT = 200       # newest entries shown per search
+SYSTEM_ACTOR = "system"
+
+
+# ---------- SCHEMA ----------
+def ensure_audit_schema():
+    """Create the append-only audit_log and the indexes behind actor, target and time searches."""
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS audit_log (
+            id BIGSERIAL PRIMARY KEY,
+            actor TEXT NOT NULL,
+            action TEXT NOT NULL,
+            target TEXT NOT NULL,
+            before JSONB,
+            after JSONB,
+            at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        );
+    """)
+    execute_query("ALTER TABLE audit_log ALTER COLUMN at SET DEFAULT LOCALTIMESTAMP;")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_audit_log_actor_at ON audit_log (actor, at);")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_audit_log_target_at ON audit_log (target text_pattern_ops, at);")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_audit_log_at ON audit_log (at);")
+    execute_query("""
+        CREATE OR REPLACE FUNCTION audit_log_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'audit_log is append-only';
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    ensure_trigger("audit_log", "audit_log_no_change", """
+        BEFORE UPDATE OR DELETE OR TRUNCATE ON audit_log
+        FOR EACH STATEMENT EXECUTE PROCEDURE audit_log_append_only()
+    """)
+
+
+# ---------- ACTOR ----------
+# Set at login; everything this terminal changes afterwards is recorded under it.
+_actor = SYSTEM_ACTOR
+
+
+def set_actor(actor):
+    global _actor
+    _actor = actor or SYSTEM_ACTOR
+
+
+# ---------- WRITER ----------
+# Entries are written in batches, so an audited action costs no extra round trip.
+# `at` is stamped by the server as each batch is inserted: within FLUSH_INTERVAL
+# of the change, or later only while the database is unreachable.
+_audit_log = BufferedWriter("audit", """
+    INSERT INTO audit_log (actor, action, target, before, after) VALUES %s
+""")
+_audit_log_lock = threading.Lock()
+
+
+def audit_log():
+    with _audit_log_lock:
+        if not _audit_log.is_alive() and not _audit_log.stopped.is_set():
+            _audit_log.start()
+    return _audit_log
+
+
+def _json(state):
+    return None if state is None else Json(state, dumps=lambda value: json.dumps(value, default=str))
+
+
+def record(action, target, before=None, after=None):
+    """Queue one audit entry; `before`/`after` are the row as dicts (None for inserts/deletes)."""
+    audit_log().add((_actor, action, target, _json(before), _json(after)))
+
+
+def audited(action, table, key, query, params=None):
+    """Run a mutating statement and audit each row it changed; return those rows.
+
+    The statement must return the row's previous and new state as jsonb columns
+    `before` and `after` (either may be NULL, e.g. for an INSERT or DELETE).
+    Each entry's target is "<table>/<key value>".
+    """
+    rows = execute_query(query, params, fetch=True)
+    for row in rows:
+        state = row["after"] or row["before"]
+        record(action, f"{table}/{state[key]}", row["before"], row["after"])
+    return rows
+
+
+# ---------- SEARCH ----------
+def audit_entries(actor=None, target=None, since=None, until=None, limit=AUDIT_LIMIT):
+    """Newest entries matching every given filter; `target` matches as a prefix (e.g. "polls/")."""
+    audit_log().flush()
+    conditions, params = [], []
+    if actor:
+        conditions.append("actor = %s")
+        params.append(actor)
+    if target:
+        conditions.append("target LIKE %s")
+        params.append(target.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    if since:
+        conditions.append("at >= %s")
+        params.append(since)
+    if until:
+        conditions.append("at < %s")
+        params.append(until)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return execute_query(f"""
+        SELECT actor, action, target, before, after, at FROM audit_log
+        {where}
+        ORDER BY at DESC, id DESC
+        LIMIT %s;
+    """, (*params, limit), fetch=True, readonly=True)
+
+
+def _changes(entry):
+    """Columns whose value differs between before and after, as "col: old → new"."""
+    before, after = entry["before"] or {}, entry["after"] or {}
+    if not before or not after:
+        return "created" if after else "removed"
+    changed = [f"{k}: {before.get(k)} → {after.get(k)}" for k in after if before.get(k) != after.get(k)]
+    return "; ".join(changed) or "-"
+
+
+def view_audit_log():
+    print("\n🧾 Audit Log")
+    actor = input("Actor, e.g. admin:admin (Enter for any): ").strip()
+    target = input("Target, e.g. amenity_bookings/12 or polls/ (Enter for any): ").strip()
+    try:
+        since_text = input("From date (YYYY-MM-DD, Enter for any): ").strip()
+        until_text = input("To date (YYYY-MM-DD, Enter for any): ").strip()
+        since = parse_date(since_text) if since_text else None
+        until = parse_date(until_text) + timedelta(days=1) if until_text else None
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    entries = audit_entries(actor, target, since, until)
+    if not render_table(["At", "Actor", "Action", "Target", "Change"],
+                        ((f"{e['at']:%Y-%m-%d %H:%M:%S}", e['actor'], e['action'], e['target'], _changes(e))
+                         for e in entries)):
+        print("ℹ️ No audit entries found.")
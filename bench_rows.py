@@ -0,0 +1,67 @@
+"""Per-row memory of RealDictCursor rows vs. namedtuple records.
+
+Fetches complaint-shaped rows from the configured database (generated with
+generate_series, so no table is read or written) once through a
+RealDictCursor with every column, as SELECT * returned them, and once through
+a plain cursor wrapped in ComplaintRow, as fetch_records does. The Python heap
+held by each result is measured with tracemalloc.
+
+    python bench_rows.py [rows]
+"""
+import sys
+import tracemalloc
+
+from psycopg2.extras import RealDictCursor
+
+from db import get_db
+from records import ComplaintRow, columns
+
+
+ROWS = 100_000
+
+# the columns SELECT * FROM complaints returns; the listings only need ComplaintRow's fields
+ALL_ROWS = """
+    SELECT i AS id, 'A-' || lpad((i % 2000)::text, 4, '0') AS flat_no, 'Plumbing' AS category,
+           'Leaking tap in kitchen #' || i AS description, 'Pending' AS status,
+           DATE '2026-01-01' AS date, 0 AS version, NULL::timestamp AS updated_at
+    FROM generate_series(1, %s) AS i
+"""
+
+
+def fetch_dict_rows(conn, n):
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute(ALL_ROWS, (n,))
+        return cur.fetchall()
+
+
+def fetch_records(conn, n):
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT {columns(ComplaintRow)} FROM ({ALL_ROWS}) c", (n,))
+        return [ComplaintRow._make(row) for row in cur]
+
+
+def measure(fetch, conn, n):
+    tracemalloc.start()
+    rows = fetch(conn, n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return current
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    conn = get_db(readonly=True)
+    try:
+        before = measure(fetch_dict_rows, conn, n)
+        after = measure(fetch_records, conn, n)
+    finally:
+        conn.close()
+    print(f"rows: {n}")
+    print(f"RealDictRow (SELECT *): {before / n:8.1f} bytes/row  {before / 2**20:7.1f} MiB")
+    print(f"ComplaintRow          : {after / n:8.1f} bytes/row  {after / 2**20:7.1f} MiB")
+    print(f"saving                : {100 * (1 - after / before):7.1f} %")
+
+
+if __name__ == "__main__":
+    main()
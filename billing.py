@@ -0,0 +1,169 @@
+from datetime import date
+
+import numpy as np
+
+from db import execute_query, fetch_columns
+from retention import add_months
+from models import Service, ValidationError, parse_month
+from audit import record
+
+
+# ---------- RATES ----------
+BASE_DUES = 1500.00         # per flat per month
+PER_MEMBER = 150.00         # per registered member of the flat
+# amenity fees are per approved booking, read from amenities.fee
+
+DELIVERY_RATES = {          # per unit delivered
+    Service.MILK.value: 30.00,
+    Service.WATER.value: 40.00,
+    Service.GAS.value: 950.00,
+    Service.NEWSPAPER.value: 8.00,
+}
+
+
+# ---------- SCHEMA ----------
+def ensure_billing_schema():
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS invoices (
+            id BIGSERIAL PRIMARY KEY,
+            flat_no TEXT NOT NULL,
+            period DATE NOT NULL,
+            maintenance NUMERIC(10, 2) NOT NULL,
+            amenity_fees NUMERIC(10, 2) NOT NULL,
+            delivery_charges NUMERIC(10, 2) NOT NULL,
+            total NUMERIC(10, 2) NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+            UNIQUE (flat_no, period)
+        );
+    """)
+
+
+# ---------- EXTRACTS ----------
+# Each returns plain columns, already grouped per flat by Postgres.
+def _flat_members():
+    # number_of_members is entered by every resident of a flat, so take the largest
+    return fetch_columns("""
+        SELECT flat_no, max(COALESCE(number_of_members, 0))
+        FROM residents WHERE approved = TRUE
+        GROUP BY flat_no;
+    """, readonly=True)
+
+
+def _amenity_usage(start, end):
+    return fetch_columns("""
+        SELECT r.flat_no, b.amenity, count(*)
+        FROM amenity_bookings b
+        JOIN (SELECT DISTINCT resident_id, flat_no FROM residents) r ON r.resident_id = b.resident_id
+        WHERE b.status = 'approved' AND b.date >= %s AND b.date < %s
+        GROUP BY r.flat_no, b.amenity;
+    """, (start, end), readonly=True)
+
+
+def _amenity_fees():
+    names, fees = fetch_columns("SELECT name, fee FROM amenities;", readonly=True)
+    return {name: float(fee) for name, fee in zip(names, fees)}
+
+
+def _delivered_units(start, end):
+    # latest log entry per flat, day and service; quantity from the flat's subscription
+    return fetch_columns("""
+        SELECT l.flat_no, l.service, sum(COALESCE(ds.quantity, 1))
+        FROM (
+            SELECT DISTINCT ON (delivery_date, service, flat_no) delivery_date, service, flat_no, delivered
+            FROM delivery_log
+            WHERE delivery_date >= %s AND delivery_date < %s
+            ORDER BY delivery_date, service, flat_no, id DESC
+        ) l
+        LEFT JOIN delivery_subscriptions ds ON ds.flat_no = l.flat_no AND ds.service = l.service
+        WHERE l.delivered
+        GROUP BY l.flat_no, l.service;
+    """, (start, end), readonly=True)
+
+
+# ---------- VECTOR HELPERS ----------
+def _flat_index(flats, keys):
+    """Positions of `keys` in `flats` (-1 where a key is not a billed flat)."""
+    order = np.argsort(flats)
+    sorted_flats = flats[order]
+    pos = np.searchsorted(sorted_flats, keys).clip(max=len(flats) - 1)
+    return np.where(sorted_flats[pos] == keys, order[pos], -1)
+
+
+def _charge(flats, keys, kinds, counts, rates):
+    """Sum count * rate[kind] per flat; unknown kinds and flats are ignored."""
+    totals = np.zeros(len(flats))
+    if not len(keys) or not len(flats):
+        return totals
+    idx = _flat_index(flats, np.asarray(keys))
+    price = np.array([rates.get(kind, 0.0) for kind in kinds])
+    amounts = price * np.asarray(counts, dtype=float)
+    billed = idx >= 0
+    np.add.at(totals, idx[billed], amounts[billed])
+    return totals
+
+
+# ---------- BILLING RUN ----------
+def compute_bills(period):
+    """Charges for every approved flat for the month starting at `period`.
+
+    Returns (flat_nos, maintenance, amenity_fees, delivery_charges, total) as arrays.
+    """
+    start, end = period, add_months(period, 1)
+    flat_nos, members = _flat_members()
+    flats = np.array(flat_nos, dtype=str)
+
+    maintenance = BASE_DUES + PER_MEMBER * np.array(members, dtype=float)
+    usage = _amenity_usage(start, end)
+    fees = _amenity_fees()
+    unpriced = set(usage[1]) - fees.keys()
+    if unpriced:
+        # bookings of an amenity that has since been removed from the catalogue
+        print(f"⚠️ No fee on file for {', '.join(sorted(unpriced))}; those bookings are not charged.")
+    amenity_fees = _charge(flats, *usage, fees)
+    delivery_charges = _charge(flats, *_delivered_units(start, end), DELIVERY_RATES)
+    total = maintenance + amenity_fees + delivery_charges
+    return flats, *(np.round(a, 2) for a in (maintenance, amenity_fees, delivery_charges, total))
+
+
+def run_billing(period):
+    """Compute the month's invoices and write them with one INSERT; re-running replaces them.
+
+    Returns (invoices written, amount billed).
+    """
+    flats, maintenance, amenity_fees, delivery_charges, total = compute_bills(period)
+    if not len(flats):
+        return 0, 0.0
+    execute_query("""
+        INSERT INTO invoices (flat_no, period, maintenance, amenity_fees, delivery_charges, total)
+        SELECT t.flat_no, %s, t.maintenance, t.amenity_fees, t.delivery_charges, t.total
+        FROM unnest(%s::text[], %s::numeric[], %s::numeric[], %s::numeric[], %s::numeric[])
+             AS t(flat_no, maintenance, amenity_fees, delivery_charges, total)
+        ON CONFLICT (flat_no, period) DO UPDATE
+        SET maintenance = EXCLUDED.maintenance, amenity_fees = EXCLUDED.amenity_fees,
+            delivery_charges = EXCLUDED.delivery_charges, total = EXCLUDED.total,
+            created_at = LOCALTIMESTAMP;
+    """, (period, flats.tolist(), maintenance.tolist(), amenity_fees.tolist(),
+          delivery_charges.tolist(), total.tolist()))
+    # one entry per run; the invoices themselves are the per-flat record
+    record("run_billing", f"invoices/{period:%Y-%m}", after={"invoices": len(flats), "total": float(total.sum())})
+    return len(flats), float(total.sum())
+
+
+def billing_run_flow():
+    print("\n💰 Monthly Billing")
+    text = input("Month to bill (YYYY-MM, Enter for last month): ").strip()
+    try:
+        period = parse_month(text) if text else add_months(date.today().replace(day=1), -1)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+
+    try:
+        count, amount = run_billing(period)
+    except Exception as e:
+        print("❌ Billing run failed:", e)
+        return
+    if not count:
+        print("ℹ️ No approved flats to bill.")
+        return
+    print(f"✅ {count} invoice(s) for {period:%Y-%m}, total {amount:,.2f}.")
@@ -0,0 +1,115 @@
+import atexit
+import threading
+
+from psycopg2.extras import execute_values
+
+from db import get_db, current_tenant, tenant_scope
+from resilience import DatabaseUnavailable, is_transient
+
+
+FLUSH_INTERVAL = 2      # seconds between background flushes
+MAX_BATCH = 500         # flush early once this many rows are waiting
+
+
+def _unreachable(error):
+    return isinstance(error, DatabaseUnavailable) or is_transient(error)
+
+
+class BufferedWriter(threading.Thread):
+    """Collects rows in memory and inserts them in batches from a background thread.
+
+    `insert_sql` is an INSERT ... VALUES %s statement for execute_values. Rows are
+    kept per society and written under that society's schema. A flush that fails
+    on connection trouble keeps its rows for the next attempt, and everything
+    left is written at exit. If the database refuses a batch outright, its rows
+    are written one at a time and the ones it still refuses are dropped.
+    """
+
+    def __init__(self, name, insert_sql, interval=FLUSH_INTERVAL, max_batch=MAX_BATCH):
+        super().__init__(daemon=True, name=f"{name}-writer")
+        self.insert_sql = insert_sql
+        self.interval = interval
+        self.max_batch = max_batch
+        self.pending = {}
+        self.offline = False
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        atexit.register(self.stop)
+
+    def add(self, row):
+        with self.lock:
+            rows = self.pending.setdefault(current_tenant(), [])
+            rows.append(row)
+            full = len(rows) >= self.max_batch
+        if full:
+            self.wake.set()
+
+    def flush(self):
+        """Write everything buffered so far; return how many rows were written."""
+        with self.lock:
+            batches, self.pending = self.pending, {}
+        written = 0
+        for schema, rows in batches.items():
+            with tenant_scope(schema):
+                done, unsent, error = self._write(rows)
+            written += done
+            if unsent:
+                if not self.offline:
+                    print(f"\n⚠️ {self.name}: database unreachable; {len(unsent)} row(s) kept for retry: {error}")
+                self.offline = True
+                with self.lock:
+                    self.pending.setdefault(schema, [])[:0] = unsent
+            else:
+                self.offline = False
+        return written
+
+    def _write(self, rows):
+        """Insert rows; return (rows written, rows to retry, the connection error)."""
+        try:
+            self._insert(rows)
+            return len(rows), [], None
+        except Exception as e:
+            if _unreachable(e):
+                return 0, rows, e
+            refused = e
+
+        written = dropped = 0
+        unsent, error = [], None
+        for n, row in enumerate(rows):
+            try:
+                self._insert([row])
+                written += 1
+            except Exception as e:
+                if _unreachable(e):
+                    unsent, error = rows[n:], e
+                    break
+                dropped += 1
+                refused = e
+        if dropped:
+            print(f"\n⚠️ {self.name}: dropped {dropped} row(s) the database refused: {refused}")
+        return written, unsent, error
+
+    def _insert(self, rows):
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            execute_values(cur, self.insert_sql, rows, page_size=self.max_batch)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        self.flush()
@@ -0,0 +1,78 @@
+import uuid
+
+from db import execute_query
+from retention import PARTITIONED_TABLES
+from audit import audited
+from models import TASK_TRANSITIONS, COMPLAINT_TRANSITIONS, allowed_sources
+
+
+# table -> its status state machine
+VERSIONED_TABLES = {
+    "maintenance_tasks": TASK_TRANSITIONS,
+    "complaints": COMPLAINT_TRANSITIONS,
+}
+
+
+# Resident inserts carry a key made once per action, so a retried insert cannot
+# add a second row. A unique index on a partitioned table must include the
+# partition key, so each key is unique together with the table's date column.
+IDEMPOTENT_TABLES = PARTITIONED_TABLES
+
+
+class StatusConflict(Exception):
+    """A compare-and-set status update did not apply; the message says why."""
+
+
+# ---------- SCHEMA ----------
+def ensure_version_columns():
+    for table in VERSIONED_TABLES:
+        execute_query(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;")
+
+
+def ensure_idempotency_keys():
+    for table, column in IDEMPOTENT_TABLES.items():
+        execute_query(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS idempotency_key TEXT;")
+        execute_query(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_idempotency_key "
+                      f"ON {table} (idempotency_key, {column});")
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
+
+
+# ---------- READ ----------
+def current_state(table, row_id):
+    """Return {'id', 'status', 'version'} for a row, or None."""
+    rows = execute_query(f"SELECT id, status, version FROM {table} WHERE id = %s;", (row_id,), fetch=True)
+    return rows[0] if rows else None
+
+
+# ---------- COMPARE AND SET ----------
+def update_status(table, row_id, expected_version, new_status, extra_sql="", extra_params=()):
+    """Move a row to `new_status` only if it is still at `expected_version` and the move is legal.
+
+    The version check and the state-machine check happen in the UPDATE itself, so
+    no lock is held while a user is typing. Returns the new version or raises
+    StatusConflict describing what changed.
+    """
+    sources = allowed_sources(VERSIONED_TABLES[table], new_status)
+    query = f"""
+        UPDATE {table} t
+        SET status = %s, version = t.version + 1{extra_sql}
+        FROM (SELECT * FROM {table} WHERE id = %s FOR UPDATE) old
+        WHERE t.id = old.id AND t.version = %s AND t.status = ANY(%s)
+        RETURNING to_jsonb(old) AS before, to_jsonb(t) AS after;
+    """
+    rows = audited("update_status", table, "id", query,
+                   (new_status.value, *extra_params, row_id, expected_version, sources))
+    if rows:
+        return rows[0]["after"]["version"]
+
+    state = current_state(table, row_id)
+    if state is None:
+        raise StatusConflict(f"Record {row_id} no longer exists.")
+    if state["version"] != expected_version:
+        raise StatusConflict(
+            f"Record {row_id} was changed by someone else (now '{state['status']}'). Reload and try again."
+        )
+    raise StatusConflict(f"Cannot move from '{state['status']}' to '{new_status}'.")
@@ -0,0 +1,137 @@
+import configparser
+import os
+
+
+# Settings come from these defaults, then the INI file, then SOCIETY_<SECTION>_<KEY>
+# environment variables (e.g. SOCIETY_DATABASE_PASSWORD, SOCIETY_POOL_MAX).
+CONFIG_FILE = os.environ.get("SOCIETY_CONFIG", "society.ini")
+ENV_PREFIX = "SOCIETY_"
+
+DEFAULTS = {
+    "database": {
+        "host": "localhost",
+        "port": "5432",
+        "database": "society_db",
+        "user": "postgres",
+        "password": "",                 # empty: libpq falls back to PGPASSWORD / ~/.pgpass
+        "sslmode": "prefer",
+        "connect_timeout": "5",         # seconds
+        "application_name": "society-cli",
+    },
+    "replicas": {
+        "hosts": "",                    # comma separated host[:port], e.g. localhost:5433
+    },
+    "pool": {
+        "min": "1",
+        "max": "10",
+    },
+    "timeouts": {
+        # applied server-side to every session; "0" disables a limit
+        "statement_timeout": "30s",
+        "lock_timeout": "5s",
+        # ends sessions left inside a transaction; paged listings do not count, as their
+        # WITH HOLD cursors are read outside a transaction (see db.stream_records)
+        "idle_in_transaction_session_timeout": "10min",
+    },
+    "resilience": {
+        "retries": "3",                 # extra attempts after a transient failure
+        "backoff_base": "0.2",          # seconds; doubles each retry, randomised below that
+        "backoff_max": "3",
+        "breaker_threshold": "5",       # consecutive connection failures before failing fast
+        "breaker_reset": "15",          # seconds before one trial connection is allowed
+    },
+    "outbox": {
+        # resident writes are queued in this local SQLite file and sent in the background
+        "path": "society_outbox.db",
+        "flush_interval": "1",          # seconds between background flushes
+        "batch": "500",                 # rows per flush transaction
+    },
+    "cache": {
+        "default_ttl": "60",            # seconds; add <name>_ttl to tune one cache
+        "slots_ttl": "10",              # bookings made on other terminals show up within this long
+    },
+}
+
+
+def load(path=CONFIG_FILE, environ=os.environ):
+    """Read the config file (if present) over the defaults and apply environment overrides."""
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_dict(DEFAULTS)
+    parser.read(path)
+    for key, value in environ.items():
+        if not key.startswith(ENV_PREFIX):
+            continue
+        section, _, option = key[len(ENV_PREFIX):].lower().partition("_")
+        if option and parser.has_section(section):
+            parser.set(section, option, value)
+    return parser
+
+
+settings = load()
+
+
+# ---------- DATABASE ----------
+def db_settings():
+    """Keyword arguments for psycopg2.connect() for the primary."""
+    db = settings["database"]
+    params = dict(
+        host=db["host"],
+        port=db.getint("port"),
+        database=db["database"],
+        user=db["user"],
+        sslmode=db["sslmode"],
+        connect_timeout=db.getint("connect_timeout"),
+        application_name=db["application_name"],
+    )
+    if db["password"]:
+        params["password"] = db["password"]
+    return params
+
+
+def replica_endpoints():
+    """Each configured replica as overrides of db_settings(), e.g. {"host": "db2", "port": 5433}."""
+    endpoints = []
+    for entry in settings["replicas"]["hosts"].split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        host, _, port = entry.partition(":")
+        endpoint = {"host": host or settings["database"]["host"]}
+        if port:
+            endpoint["port"] = int(port)
+        endpoints.append(endpoint)
+    return endpoints
+
+
+def pool_limits():
+    return settings["pool"].getint("min"), settings["pool"].getint("max")
+
+
+def session_options():
+    """Server-side limits as libpq `options` (-c name=value ...)."""
+    return " ".join(f"-c {name}={value}" for name, value in settings["timeouts"].items())
+
+
+def resilience_settings():
+    """Retry and circuit-breaker knobs used by resilience.py."""
+    r = settings["resilience"]
+    return dict(
+        retries=r.getint("retries"),
+        backoff_base=r.getfloat("backoff_base"),
+        backoff_max=r.getfloat("backoff_max"),
+        breaker_threshold=r.getint("breaker_threshold"),
+        breaker_reset=r.getfloat("breaker_reset"),
+    )
+
+
+def outbox_settings():
+    """(path, flush interval, batch size) for the local write queue."""
+    o = settings["outbox"]
+    return o["path"], o.getfloat("flush_interval"), o.getint("batch")
+
+
+# ---------- CACHES ----------
+def cache_ttl(name):
+    """Seconds a cache called `name` may serve a value; `<name>_ttl` or default_ttl."""
+    cache = settings["cache"]
+    return cache.getint(f"{name}_ttl", fallback=cache.getint("default_ttl"))
@@ -0,0 +1,124 @@
+from db import execute_query
+from output import render_table
+
+
+DASHBOARD_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_complaints_open_flat ON complaints (flat_no) WHERE status <> 'Resolved';",
+    "CREATE INDEX IF NOT EXISTS idx_skip_delivery_flat_date ON skip_delivery (flat_no, skip_date);",
+    "CREATE INDEX IF NOT EXISTS idx_amenity_bookings_resident ON amenity_bookings (resident_id, date);",
+    "CREATE INDEX IF NOT EXISTS idx_votes_flat ON votes (flat_no, poll_id);",
+    "CREATE INDEX IF NOT EXISTS idx_maintenance_tasks_flat ON maintenance_tasks (flat_no, status);",
+    "CREATE INDEX IF NOT EXISTS idx_residents_flat ON residents (flat_no) WHERE approved;",
+]
+
+# One statement: every source is grouped by flat once and joined onto the flat list.
+# {scope} / {r_scope} narrow each grouped subquery to one flat for the resident view.
+# Open polls are the ones residents can vote in now, as in open_polls_for_flat.
+DASHBOARD_QUERY = """
+    SELECT f.flat_no,
+           COALESCE(c.open_complaints, 0)   AS open_complaints,
+           COALESCE(s.upcoming_skips, 0)    AS upcoming_skips,
+           COALESCE(b.pending_bookings, 0)  AS pending_bookings,
+           COALESCE(b.approved_bookings, 0) AS approved_bookings,
+           COALESCE(v.polls_voted, 0)       AS polls_voted,
+           op.open_polls,
+           COALESCE(t.open_tasks, 0)        AS open_tasks,
+           COALESCE(t.done_tasks, 0)        AS done_tasks
+    FROM (SELECT DISTINCT flat_no FROM residents WHERE approved = TRUE {scope}) f
+    CROSS JOIN (
+        SELECT count(*) AS open_polls FROM polls p
+        WHERE p.status = 'open' AND p.starts_at <= LOCALTIMESTAMP
+          AND (p.ends_at IS NULL OR p.ends_at > LOCALTIMESTAMP)
+    ) op
+    LEFT JOIN (
+        SELECT flat_no, count(*) AS open_complaints
+        FROM complaints WHERE status <> 'Resolved' {scope}
+        GROUP BY flat_no
+    ) c USING (flat_no)
+    LEFT JOIN (
+        SELECT flat_no, count(*) AS upcoming_skips
+        FROM skip_delivery WHERE skip_date >= CURRENT_DATE {scope}
+        GROUP BY flat_no
+    ) s USING (flat_no)
+    LEFT JOIN (
+        SELECT r.flat_no,
+               count(*) FILTER (WHERE b.status = 'pending')  AS pending_bookings,
+               count(*) FILTER (WHERE b.status = 'approved') AS approved_bookings
+        FROM amenity_bookings b JOIN residents r ON r.resident_id = b.resident_id
+        WHERE b.date >= CURRENT_DATE {r_scope}
+        GROUP BY r.flat_no
+    ) b USING (flat_no)
+    LEFT JOIN (
+        SELECT v.flat_no, count(*) AS polls_voted
+        FROM votes v JOIN polls p ON p.id = v.poll_id
+        WHERE p.status = 'open' AND p.starts_at <= LOCALTIMESTAMP
+          AND (p.ends_at IS NULL OR p.ends_at > LOCALTIMESTAMP) {v_scope}
+        GROUP BY v.flat_no
+    ) v USING (flat_no)
+    LEFT JOIN (
+        SELECT flat_no,
+               count(*) FILTER (WHERE status <> 'Completed') AS open_tasks,
+               count(*) FILTER (WHERE status = 'Completed')  AS done_tasks
+        FROM maintenance_tasks WHERE flat_no IS NOT NULL {scope}
+        GROUP BY flat_no
+    ) t USING (flat_no)
+    {order}
+"""
+
+
+# ---------- SCHEMA ----------
+def ensure_dashboard_indexes():
+    for statement in DASHBOARD_INDEXES:
+        execute_query(statement)
+
+
+# ---------- QUERIES ----------
+def flat_summary(flat_no):
+    query = DASHBOARD_QUERY.format(
+        scope="AND flat_no = %(flat)s",
+        r_scope="AND r.flat_no = %(flat)s",
+        v_scope="AND v.flat_no = %(flat)s",
+        order="",
+    )
+    rows = execute_query(query, {"flat": flat_no}, fetch=True, readonly=True)
+    return rows[0] if rows else None
+
+
+def society_summary():
+    query = DASHBOARD_QUERY.format(scope="", r_scope="", v_scope="", order="ORDER BY f.flat_no")
+    return execute_query(query, fetch=True, readonly=True)
+
+
+# ---------- RESIDENT DASHBOARD ----------
+def view_flat_dashboard(flat_no):
+    d = flat_summary(flat_no)
+    if not d:
+        print("ℹ️ No activity found for your flat.")
+        return
+    print(f"\n🏠 Dashboard for Flat {flat_no}")
+    print(f"⚠️ Open complaints : {d['open_complaints']}")
+    print(f"⏭️ Upcoming skips  : {d['upcoming_skips']}")
+    print(f"📅 Bookings        : {d['pending_bookings']} pending / {d['approved_bookings']} approved")
+    print(f"🗳️ Polls           : voted in {d['polls_voted']} of {d['open_polls']} open")
+    print(f"🛠 Tasks           : {d['open_tasks']} open / {d['done_tasks']} completed")
+
+
+# ---------- ADMIN DASHBOARD ----------
+def view_society_dashboard():
+    rows = society_summary()
+    if not rows:
+        print("ℹ️ No approved flats yet.")
+        return
+
+    totals = {key: sum(r[key] for r in rows)
+              for key in ("open_complaints", "upcoming_skips", "pending_bookings", "open_tasks")}
+    print(f"\n🏢 Society Dashboard ({len(rows)} flats)")
+    print(f"⚠️ Open complaints: {totals['open_complaints']} | ⏭️ Upcoming skips: {totals['upcoming_skips']} | "
+          f"📅 Pending bookings: {totals['pending_bookings']} | 🛠 Open tasks: {totals['open_tasks']}")
+
+    needs_attention = ((r['flat_no'], r['open_complaints'], r['open_tasks'], r['pending_bookings'],
+                        f"{r['polls_voted']}/{r['open_polls']}")
+                       for r in rows if r['open_complaints'] or r['open_tasks'] or r['pending_bookings'])
+    if not render_table(["Flat No", "Open Complaints", "Open Tasks", "Pending Bookings", "Polls Voted"],
+                        needs_attention):
+        print("✅ No flats need attention.")
@@ -1,17 +1,381 @@
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+import psycopg2.extensions
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+import config
+from resilience import DatabaseUnavailable, breaker, call_with_retry
+
+
+# Connection settings live in society.ini / SOCIETY_* environment variables (see config.py).
+DB_SETTINGS = config.db_settings()
+
+# Read-only calls go to these hot standbys; each entry overrides DB_SETTINGS,
+# e.g. [{"port": 5433}] for a second local instance. Empty means primary only.
+REPLICAS = config.replica_endpoints()
+
+# per server and shared by every society: execute_prepared's pool holds at most
+# POOL_MAX connections, and at most POOL_MAX more are open at once through get_db
+# (the other helpers, streams, listeners); past that callers wait for one to close
+POOL_MIN, POOL_MAX = config.pool_limits()
+SLOT_WAIT = 30    # seconds to wait for a free connection before giving up
+
+
+# ---------- TENANTS ----------
+# Each society lives in its own schema; "public" holds the original single-society install
+# and the society registry. A society's search_path is its schema alone, so no query
+# can fall through to another society's tables; shared tables are named public.<table>.
+DEFAULT_TENANT = "public"
+_tenant = DEFAULT_TENANT
+_local = threading.local()
+
+
+def set_tenant(schema):
+    """Select the society schema used by every connection from now on."""
+    global _tenant
+    _tenant = schema
+
+
+def current_tenant():
+    return getattr(_local, "schema", None) or _tenant
+
+
+@contextmanager
+def tenant_scope(schema):
+    """Run a block against another society on this thread only (e.g. background sweeps)."""
+    previous = getattr(_local, "schema", None)
+    _local.schema = schema
+    try:
+        yield schema
+    finally:
+        _local.schema = previous
+
+
+def _options(schema=None):
+    """libpq options: the configured statement/lock timeouts, plus a search_path if given."""
+    options = config.session_options()
+    if schema:
+        options += f" -c search_path={schema}"
+    return options
+
+
+# ---------- READ REPLICAS ----------
+# Highest WAL position this process has committed on the primary. A replica only
+# serves reads once it has replayed that far, so a session always sees its own writes.
+_last_write_lsn = None
+_lsn_lock = threading.Lock()
+_next_replica = 0
+
+
+def _lsn_value(lsn):
+    high, low = lsn.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+def _note_write(conn):
+    global _last_write_lsn
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_current_wal_lsn()::text;")
+        lsn = cur.fetchone()[0]
+    with _lsn_lock:
+        if _last_write_lsn is None or _lsn_value(lsn) > _lsn_value(_last_write_lsn):
+            _last_write_lsn = lsn
+
+
+def _caught_up(conn):
+    """True if this replica has replayed every write the session has made."""
+    lsn = _last_write_lsn
+    if lsn is None:
+        return True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn;", (lsn,))
+        return bool(cur.fetchone()[0])
+
+
+def _replica_order():
+    """Configured replicas, rotated so reads are spread across them."""
+    global _next_replica
+    with _lsn_lock:
+        start = _next_replica
+        _next_replica += 1
+    return [REPLICAS[(start + i) % len(REPLICAS)] for i in range(len(REPLICAS))]
+
+
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+def _server_slots(settings):
+    """The semaphore counting this process's direct connections to one server."""
+    key = (settings.get("host"), settings.get("port"))
+    with _slots_lock:
+        if key not in _slots:
+            _slots[key] = threading.BoundedSemaphore(POOL_MAX)
+        return _slots[key]
+
+
+def _connect(settings, replica=False):
+    """Open a connection once one of the server's POOL_MAX slots is free; close() frees it."""
+    slots = _server_slots(settings)
+    if not slots.acquire(timeout=SLOT_WAIT):
+        raise DatabaseUnavailable(f"All {POOL_MAX} database connections are in use; try again shortly.")
+    try:
+        conn = psycopg2.connect(**settings, connection_factory=SocietyConnection, options=_options(current_tenant()))
+    except Exception:
+        slots.release()
+        raise
+    conn.slots = slots
+    conn.replica = replica
+    return conn
+
+
+def _replica_connection():
+    """A connection to a caught-up replica, or None so the caller uses the primary."""
+    for overrides in _replica_order():
+        try:
+            conn = _connect({**DB_SETTINGS, **overrides}, replica=True)
+        except psycopg2.OperationalError:
+            continue
+        try:
+            if _caught_up(conn):
+                return conn
+        except psycopg2.Error:
+            pass
+        conn.close()
+    return None
+
+
+def get_db(readonly=False):
+    """Connect to PostgreSQL database.
+
+    With readonly=True the connection may come from a replica that is caught up
+    with this session's writes; otherwise (or if none is) it is the primary.
+    Failed connections to the primary are retried with backoff behind the
+    circuit breaker; if it stays unreachable DatabaseUnavailable is raised.
+    """
+    if readonly and REPLICAS:
+        conn = _replica_connection()
+        if conn is not None:
+            return conn
+    conn = call_with_retry(lambda: _connect(DB_SETTINGS), breaker)
+    conn.wrote = not readonly
+    return conn
+
+
+def execute_query(query, params=None, fetch=False, many=False, readonly=False, idempotent=False):
+    """Run a query on a fresh connection and return rows when fetch=True.
+
+    Reads (readonly=True) and writes that are safe to repeat (idempotent=True,
+    e.g. keyed inserts with ON CONFLICT DO NOTHING) are run again if the
+    connection drops or the transaction hits a deadlock or serialization failure.
+    """
+    def attempt():
+        conn = get_db(readonly)
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        try:
+            if many:
+                cur.executemany(query, params)
+            else:
+                cur.execute(query, params)
+            if fetch:
+                data = cur.fetchall()
+            else:
+                data = None
+            conn.commit()
+            return data
+        finally:
+            cur.close()
+            conn.close()
+
+    return call_with_retry(attempt) if readonly or idempotent else attempt()
+
+
+def ensure_trigger(table, name, definition):
+    """Create trigger `name` on `table` unless it already exists.
+
+    `definition` is the rest of the CREATE TRIGGER statement after the name.
+    Checking pg_trigger instead of dropping and re-creating means the trigger
+    never goes missing for other sessions and a repeat run changes nothing.
+    """
+    execute_query(f"""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_trigger WHERE tgrelid = '{table}'::regclass AND tgname = '{name}'
+            ) THEN
+                CREATE TRIGGER {name} {definition};
+            END IF;
+        END $$;
+    """)
+
+
+def fetch_records(record, query, params=None, readonly=False):
+    """Run a SELECT on a plain tuple cursor and wrap each row in `record` (a namedtuple type)."""
+    def attempt():
+        conn = get_db(readonly)
+        cur = conn.cursor()
+        try:
+            cur.execute(query, params)
+            return [record._make(row) for row in cur]
+        finally:
+            cur.close()
+            conn.close()
+
+    return call_with_retry(attempt) if readonly else attempt()
+
+
+def fetch_columns(query, params=None, readonly=False):
+    """Run a SELECT and return its result column-wise: one list per selected column."""
+    def attempt():
+        conn = get_db(readonly)
+        cur = conn.cursor()
+        try:
+            cur.execute(query, params)
+            return cur.fetchall(), len(cur.description)
+        finally:
+            cur.close()
+            conn.close()
+
+    rows, width = call_with_retry(attempt) if readonly else attempt()
+    return [list(column) for column in zip(*rows)] if rows else [[] for _ in range(width)]
+
+
+STREAM_BATCH = 500
+
+
+def stream_records(record, query, params=None, itersize=STREAM_BATCH, readonly=False):
+    """Yield `record` rows from a server-side cursor, holding one batch in memory at a time.
+
+    The cursor is declared WITH HOLD on an autocommit connection: the result is
+    kept on the server once DECLARE completes and no transaction stays open
+    between batches, e.g. while a paged listing waits at its prompt.
+    """
+    conn = get_db(readonly)
+    conn.autocommit = True
+    cur = conn.cursor(name="society_stream", withhold=True)
+    cur.itersize = itersize
+    try:
+        cur.execute(query, params)
+        for row in cur:
+            yield record._make(row)
+    finally:
+        cur.close()
+        conn.close()
+
+
+# ---------- CONNECTION POOL ----------
+class SocietyConnection(psycopg2.extensions.connection):
+    """Connection that remembers its PREPAREd statements and records its commits' WAL position.
+
+    Connections opened by get_db hold one of their server's slots until closed.
+
+    `wrote` is set when the connection is handed out for writing; only those
+    commits cost the extra pg_current_wal_lsn() round trip.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.tenant = None
+        self.replica = False
+        self.wrote = False
+        self.slots = None
+
+    def close(self):
+        super().close()
+        # a get_db connection gives its slot back (once, however often it is closed)
+        slots, self.slots = self.slots, None
+        if slots is not None:
+            slots.release()
+
+    def commit(self):
+        super().commit()
+        if self.wrote and REPLICAS and not self.replica:
+            _note_write(self)
+        self.wrote = False
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool(replica=None):
+    """The primary's pool, or the pool for one entry of REPLICAS."""
+    key = None if replica is None else tuple(sorted(replica.items()))
+    with _pool_lock:
+        if key not in _pools:
+            settings = DB_SETTINGS if replica is None else {**DB_SETTINGS, **replica}
+            _pools[key] = ThreadedConnectionPool(POOL_MIN, POOL_MAX, connection_factory=SocietyConnection,
+                                                 options=_options(), **settings)
+        return _pools[key]
+
+
+def _borrow_replica():
+    """(pool, connection) for a caught-up replica, or (None, None)."""
+    for overrides in _replica_order():
+        try:
+            pool = get_pool(overrides)
+            conn = pool.getconn()
+        except psycopg2.Error:
+            continue
+        conn.replica = True
+        try:
+            if _caught_up(conn):
+                return pool, conn
+            conn.rollback()
+        except psycopg2.Error:
+            pass
+        pool.putconn(conn, close=bool(conn.closed))
+    return None, None
+
+
+def _borrow_primary():
+    pool = get_pool()
+    return pool, pool.getconn()
+
+
+def _use_tenant(conn):
+    """Point a pooled connection at the current society's schema.
+
+    The SET is committed on its own so a later rollback cannot undo it. Prepared
+    statements stay valid: Postgres re-plans them when search_path changes.
+    """
+    schema = current_tenant()
+    if conn.tenant != schema:
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {schema};")
+        conn.commit()
+        conn.tenant = schema
+
+
+@contextmanager
+def pooled_connection(readonly=False):
+    """Borrow a pooled connection; commit on success, roll back on error.
 
-def get_db():
-    """Connect to PostgreSQL database."""
+    readonly=True borrows from a caught-up replica when one is available.
+    """
+    pool = conn = None
+    if readonly and REPLICAS:
+        pool, conn = _borrow_replica()
+    if conn is None:
+        pool, conn = call_with_retry(_borrow_primary, breaker)
     try:
-        conn = psycopg2.connect(
-            host="localhost",         # change this to your PostgreSQL host
-            database="society_db",    # change this to your database name
-            user="postgres",          # change this to your username
-            password="admin",         # change this to your password
-            port=5432                 # default PostgreSQL port
-        )
-        return conn
-    except Exception as e:
-        print("❌ Error connecting to PostgreSQL:", e)
-        return None
+        _use_tenant(conn)
+        conn.wrote = not readonly
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.wrote = False
+        if not conn.closed:
+            conn.rollback()
+            # a failed transaction may or may not have kept its PREPAREs; start clean
+            with conn.cursor() as cur:
+                cur.execute("DEALLOCATE ALL;")
+            conn.commit()
+        conn.prepared.clear()
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
@@ -1,63 +1,30 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from datetime import date
-
-
-# ---------- DATABASE CONNECTION ----------
-def get_db():
-    """Connect to PostgreSQL database."""
-    return psycopg2.connect(
-        host="localhost",      # change this to your host
-        database="society_db", # change this to your DB name
-        user="postgres",       # change this to your username
-        password="admin",      # change this to your password
-        port=5432
-    )
-
-
-# ---------- HELPER FUNCTION ----------
-def execute_query(query, params=None, fetch=False):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute(query, params)
-        if fetch:
-            data = cur.fetchall()
-        else:
-            data = None
-        conn.commit()
-        return data
-    finally:
-        cur.close()
-        conn.close()
+from notifications import watch_skips
+from queries import execute_prepared
+from models import Service, ValidationError
+from deliveries import print_manifest, mark_delivered_flow, view_reconciliation
 
 
 # ---------- VIEW TODAY'S DELIVERY ----------
 def view_todays_delivery(service_type):
-    today = str(date.today())
-
-    # Get skipped flats for today
-    query_skips = "SELECT flat_no FROM skip_delivery WHERE skip_date=%s AND item=%s;"
-    skipped = execute_query(query_skips, (today, service_type), fetch=True)
-    skipped_flats = [s['flat_no'] for s in skipped] if skipped else []
-
-    # Get approved residents
-    query_residents = "SELECT flat_no, name FROM residents WHERE approved=TRUE;"
-    residents = execute_query(query_residents, fetch=True)
-
-    print(f"\n📦 Delivery list for {service_type} - {today}:")
-    for res in residents:
-        if res['flat_no'] not in skipped_flats:
-            print(f"Flat {res['flat_no']} - {res['name']}")
-    if not skipped_flats:
-        print("✅ No skips today!")
+    try:
+        service_type = Service.parse(service_type)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    # one stop per flat in tower/floor route order, skips already removed
+    print_manifest(service_type, date.today())
 
 
 # ---------- VIEW SKIPPED DELIVERIES ----------
 def view_skipped_deliveries(service_type):
+    try:
+        service_type = Service.parse(service_type)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
     today = str(date.today())
-    query_skips = "SELECT flat_no FROM skip_delivery WHERE skip_date=%s AND item=%s;"
-    skips = execute_query(query_skips, (today, service_type), fetch=True)
+    skips = execute_prepared("skips_for_day", (today, service_type.value), readonly=True)
 
     print(f"\n📌 Skipped {service_type} deliveries for {today}:")
     if not skips:
@@ -73,7 +40,10 @@ def delivery_menu(username):
         print("\n--- Delivery Staff Menu ---")
         print("1. View today's full delivery list")
         print("2. View skipped deliveries")
-        print("3. Logout")
+        print("3. Watch skip requests (live)")
+        print("4. Mark items delivered")
+        print("5. Delivery reconciliation report")
+        print("6. Logout")
 
         choice = input("Enter choice: ")
 
@@ -86,6 +56,16 @@ def delivery_menu(username):
             view_skipped_deliveries(service)
 
         elif choice == "3":
+            service = input("Enter service (milk/water/newspaper): ")
+            watch_skips(service)
+
+        elif choice == "4":
+            mark_delivered_flow(username)
+
+        elif choice == "5":
+            view_reconciliation()
+
+        elif choice == "6":
             print("Logging out...")
             break
 
@@ -0,0 +1,378 @@
+import sys
+from datetime import date, timedelta
+from itertools import groupby
+
+from db import execute_query, ensure_trigger
+from audit import audited, record
+from output import render_table
+from models import Service, ValidationError, parse_date, parse_flat, parse_range, parse_id, require
+
+
+# ---------- SCHEMA ----------
+def ensure_delivery_log():
+    """Create the append-only delivery_log and its (date, service) index.
+
+    Rows are never changed: a correction is a newer row for the same flat, and
+    the latest row per (date, service, flat) is the one that counts.
+    """
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS delivery_log (
+            id BIGSERIAL PRIMARY KEY,
+            delivery_date DATE NOT NULL,
+            service TEXT NOT NULL,
+            flat_no TEXT NOT NULL,
+            delivered BOOLEAN NOT NULL,
+            note TEXT,
+            staff TEXT NOT NULL,
+            logged_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        );
+    """)
+    execute_query("""
+        CREATE INDEX IF NOT EXISTS idx_delivery_log_date_service
+        ON delivery_log (delivery_date, service, flat_no, id);
+    """)
+    execute_query("""
+        CREATE OR REPLACE FUNCTION delivery_log_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'delivery_log is append-only; log a correcting entry instead';
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    ensure_trigger("delivery_log", "delivery_log_no_change", """
+        BEFORE UPDATE OR DELETE ON delivery_log
+        FOR EACH STATEMENT EXECUTE PROCEDURE delivery_log_append_only()
+    """)
+
+
+def ensure_route_schema():
+    """Create flat_routes and delivery_subscriptions, then route any new flats."""
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS flat_routes (
+            flat_no TEXT PRIMARY KEY,
+            tower TEXT NOT NULL,
+            floor INTEGER NOT NULL,
+            unit INTEGER NOT NULL,
+            route_seq INTEGER NOT NULL
+        );
+    """)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_flat_routes_route ON flat_routes (tower, route_seq);")
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS delivery_subscriptions (
+            flat_no TEXT NOT NULL,
+            service TEXT NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity >= 0),
+            PRIMARY KEY (flat_no, service)
+        );
+    """)
+    sync_flat_routes()
+
+
+# ---------- ROUTES ----------
+def route_seq(key):
+    """Stop order within a tower: floor by floor, snaking along each corridor.
+
+    Stored per flat so a building's round can be re-ordered by hand in flat_routes.
+    """
+    unit = key.unit if key.floor % 2 == 0 else 99 - key.unit
+    return key.floor * 100 + unit
+
+
+def sync_flat_routes(rebuild=False):
+    """Parse and route flats that have no route yet (or every flat with rebuild=True).
+
+    Flats whose number cannot be parsed stay unrouted and are listed last.
+    Returns how many routes were written.
+    """
+    missing = "" if rebuild else "AND NOT EXISTS (SELECT 1 FROM flat_routes rt WHERE rt.flat_no = r.flat_no)"
+    rows = execute_query(f"SELECT DISTINCT r.flat_no FROM residents r WHERE r.approved = TRUE {missing};", fetch=True)
+
+    routes = []
+    for row in rows:
+        try:
+            key = parse_flat(row["flat_no"])
+        except ValidationError:
+            continue
+        routes.append((row["flat_no"], key))
+    if not routes:
+        return 0
+
+    execute_query("""
+        INSERT INTO flat_routes (flat_no, tower, floor, unit, route_seq)
+        SELECT * FROM unnest(%s::text[], %s::text[], %s::int[], %s::int[], %s::int[])
+        ON CONFLICT (flat_no) DO UPDATE
+        SET tower = EXCLUDED.tower, floor = EXCLUDED.floor, unit = EXCLUDED.unit, route_seq = EXCLUDED.route_seq;
+    """, ([f for f, _ in routes], [k.tower for _, k in routes], [k.floor for _, k in routes],
+          [k.unit for _, k in routes], [route_seq(k) for _, k in routes]))
+    return len(routes)
+
+
+# ---------- MANIFEST ----------
+# One stop per flat in route order. Flats without a subscription row get 1 unit;
+# a quantity of 0 means the flat has opted out of the service.
+MANIFEST_QUERY = """
+    SELECT f.flat_no, rt.tower, rt.floor, COALESCE(ds.quantity, 1) AS quantity
+    FROM (SELECT DISTINCT flat_no FROM residents WHERE approved = TRUE) f
+    LEFT JOIN flat_routes rt ON rt.flat_no = f.flat_no
+    LEFT JOIN delivery_subscriptions ds ON ds.flat_no = f.flat_no AND ds.service = %(service)s
+    WHERE COALESCE(ds.quantity, 1) > 0
+      AND NOT EXISTS (
+          SELECT 1 FROM skip_delivery s
+          WHERE s.skip_date = %(day)s AND s.item = %(service)s AND s.flat_no = f.flat_no
+      )
+    ORDER BY rt.tower NULLS LAST, rt.route_seq NULLS LAST, f.flat_no;
+"""
+
+
+def manifest(service, day):
+    return execute_query(MANIFEST_QUERY, {"service": service.value, "day": day}, fetch=True, readonly=True)
+
+
+def manifest_flats(service, day):
+    """Flats due `service` on `day`, in route order."""
+    return [r["flat_no"] for r in manifest(service, day)]
+
+
+def in_scope(flats, tower=None, floors=None):
+    """Flats in one tower and/or floor range; unparseable numbers only match the whole manifest."""
+    if tower is None and floors is None:
+        return list(flats)
+    selected = []
+    for flat in flats:
+        try:
+            key = parse_flat(flat)
+        except ValidationError:
+            continue
+        if tower is not None and key.tower != tower:
+            continue
+        if floors is not None and not floors[0] <= key.floor <= floors[1]:
+            continue
+        selected.append(flat)
+    return selected
+
+
+def print_manifest(service, day):
+    """Print the round one floor at a time, pausing between floors on a terminal."""
+    rows = manifest(service, day)
+    if not rows:
+        print(f"ℹ️ Nothing to deliver for {service} on {day}.")
+        return
+
+    total = sum(r["quantity"] for r in rows)
+    print(f"\n📦 {service} round for {day}: {len(rows)} stop(s), {total} unit(s)")
+    interactive = sys.stdin.isatty() and sys.stdout.isatty()
+    floors = groupby(rows, key=lambda r: (r["tower"], r["floor"]))
+    for (tower, floor), stops in floors:
+        if tower is None:
+            print("\n🏢 Unrouted flats")
+        else:
+            print(f"\n🏢 Tower {tower or '-'} · Floor {floor}")
+        render_table(["Flat", "Qty"], ((r["flat_no"], r["quantity"]) for r in stops), page_size=0)
+        if interactive and input("-- Enter for next floor, q to stop -- ").strip().lower() == "q":
+            break
+
+
+# ---------- SUBSCRIPTIONS ----------
+def set_subscription(flat_no, service, quantity):
+    audited("set_subscription", "delivery_subscriptions", "flat_no", """
+        WITH old AS (
+            SELECT * FROM delivery_subscriptions WHERE flat_no = %s AND service = %s FOR UPDATE
+        ), ds AS (
+            INSERT INTO delivery_subscriptions (flat_no, service, quantity)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (flat_no, service) DO UPDATE SET quantity = EXCLUDED.quantity
+            RETURNING *
+        )
+        SELECT (SELECT to_jsonb(old) FROM old) AS before, to_jsonb(ds) AS after FROM ds;
+    """, (flat_no, service.value, flat_no, service.value, quantity))
+
+
+def manage_subscription(flat_no):
+    rows = execute_query("SELECT service, quantity FROM delivery_subscriptions WHERE flat_no = %s;",
+                         (flat_no,), fetch=True)
+    current = {r["service"]: r["quantity"] for r in rows}
+    print(f"\n🧾 Daily deliveries for Flat {flat_no}")
+    for service in Service:
+        print(f"- {service}: {current.get(service.value, 1)}")
+    try:
+        service = Service.parse(input("Service to change: "))
+        quantity = parse_id(input("Daily quantity (0 to stop): "), "Quantity")
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    set_subscription(flat_no, service, quantity)
+    print(f"✅ {service}: {quantity} per day.")
+
+
+# ---------- RECORD ----------
+def mark_delivered(staff, service, day, flats, exceptions=None):
+    """Log `flats` as delivered and `exceptions` ({flat: reason}) as not, in one INSERT.
+
+    Every flat must be on the day's manifest for the service; otherwise
+    ValidationError is raised and nothing is logged.
+    Returns (delivered, exceptions) counts as written.
+    """
+    exceptions = exceptions or {}
+    flats = list(dict.fromkeys(list(flats) + list(exceptions)))
+    due = set(manifest_flats(service, day))
+    unknown = [f for f in flats if f not in due]
+    if unknown:
+        raise ValidationError(f"Not on the {service} manifest for {day}: {', '.join(unknown)}")
+    query = """
+        WITH ins AS (
+            INSERT INTO delivery_log (delivery_date, service, flat_no, delivered, note, staff)
+            SELECT %s, %s, t.flat_no, t.delivered, t.note, %s
+            FROM unnest(%s::text[], %s::boolean[], %s::text[]) AS t(flat_no, delivered, note)
+            RETURNING delivered
+        )
+        SELECT count(*) FILTER (WHERE delivered) AS delivered,
+               count(*) FILTER (WHERE NOT delivered) AS exceptions
+        FROM ins;
+    """
+    rows = execute_query(query, (
+        day, service.value, staff,
+        flats, [f not in exceptions for f in flats], [exceptions.get(f) for f in flats]
+    ), fetch=True)
+    record("mark_delivered", f"delivery_log/{day}/{service.value}", after={
+        "staff": staff, "delivered": [f for f in flats if f not in exceptions], "exceptions": exceptions,
+    })
+    return rows[0]["delivered"], rows[0]["exceptions"]
+
+
+def parse_exceptions(text):
+    """'A-101: not home, B-203' -> {'A-101': 'not home', 'B-203': None}."""
+    exceptions = {}
+    for item in (text or "").split(","):
+        flat, _, reason = item.partition(":")
+        if flat.strip():
+            exceptions[flat.strip()] = reason.strip() or None
+    return exceptions
+
+
+def mark_delivered_flow(staff):
+    print("\n✅ Mark Deliveries")
+    try:
+        service = Service.parse(input("Service (milk/water/gas/newspaper): "))
+        day_text = input("Date (YYYY-MM-DD, Enter for today): ").strip()
+        day = parse_date(day_text) if day_text else date.today()
+
+        print("1. Whole manifest")
+        print("2. One tower")
+        print("3. Floor range")
+        scope = input("Choose scope: ").strip()
+        tower = floors = None
+        if scope == "2":
+            tower = require(input("Tower: "), "Tower").upper()
+        elif scope == "3":
+            tower = input("Tower (Enter for all): ").strip().upper() or None
+            floors = parse_range(input("Floors (e.g. 3-7): "), "Floor range")
+        elif scope != "1":
+            print("❌ Invalid scope.")
+            return
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+
+    flats = in_scope(manifest_flats(service, day), tower, floors)
+    if not flats:
+        print("ℹ️ No flats on the manifest for that selection.")
+        return
+    print(f"📦 {len(flats)} flat(s) selected for {service} on {day}.")
+    exceptions = parse_exceptions(input("Exceptions (flat[: reason], comma separated; Enter for none): "))
+    # exceptions are matched to the selection as typed in any case; anything else is refused
+    selected = {f.upper(): f for f in flats}
+    unknown = [f for f in exceptions if f.upper() not in selected]
+    if unknown:
+        print(f"❌ Not in this selection: {', '.join(unknown)}. Nothing was logged.")
+        return
+    exceptions = {selected[f.upper()]: reason for f, reason in exceptions.items()}
+
+    try:
+        delivered, missed = mark_delivered(staff, service, day, flats, exceptions)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    except Exception as e:
+        print("❌ Could not record deliveries:", e)
+        return
+    print(f"✅ Logged {delivered} delivered, {missed} exception(s).")
+
+
+# ---------- RECONCILIATION ----------
+RECONCILIATION_QUERY = """
+    WITH days AS (
+        SELECT d::date AS day, s.service
+        FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') AS d
+        CROSS JOIN unnest(%(services)s::text[]) AS s(service)
+    ), flats AS (
+        SELECT s.service, count(*) AS total
+        FROM (SELECT DISTINCT flat_no FROM residents WHERE approved = TRUE) r
+        CROSS JOIN unnest(%(services)s::text[]) AS s(service)
+        LEFT JOIN delivery_subscriptions ds ON ds.flat_no = r.flat_no AND ds.service = s.service
+        WHERE COALESCE(ds.quantity, 1) > 0
+        GROUP BY s.service
+    ), skips AS (
+        SELECT skip_date AS day, item AS service, count(DISTINCT flat_no) AS skipped
+        FROM skip_delivery
+        WHERE skip_date BETWEEN %(start)s AND %(end)s
+        GROUP BY 1, 2
+    ), latest AS (
+        SELECT DISTINCT ON (delivery_date, service, flat_no) delivery_date, service, flat_no, delivered
+        FROM delivery_log
+        WHERE delivery_date BETWEEN %(start)s AND %(end)s
+        ORDER BY delivery_date, service, flat_no, id DESC
+    ), logged AS (
+        SELECT l.delivery_date AS day, l.service,
+               count(*) FILTER (WHERE l.delivered) AS delivered,
+               count(*) FILTER (WHERE NOT l.delivered) AS exceptions,
+               count(*) FILTER (WHERE l.delivered AND s.flat_no IS NOT NULL) AS despite_skip
+        FROM latest l
+        LEFT JOIN skip_delivery s
+          ON s.skip_date = l.delivery_date AND s.item = l.service AND s.flat_no = l.flat_no
+        GROUP BY 1, 2
+    )
+    SELECT d.day, d.service,
+           f.total - COALESCE(s.skipped, 0)  AS manifest,
+           COALESCE(s.skipped, 0)            AS skipped,
+           COALESCE(l.delivered, 0)          AS delivered,
+           COALESCE(l.exceptions, 0)         AS exceptions,
+           COALESCE(l.despite_skip, 0)       AS despite_skip,
+           GREATEST(f.total - COALESCE(s.skipped, 0) - COALESCE(l.exceptions, 0)
+                    - (COALESCE(l.delivered, 0) - COALESCE(l.despite_skip, 0)), 0) AS unaccounted
+    FROM days d
+    JOIN flats f USING (service)
+    LEFT JOIN skips s USING (day, service)
+    LEFT JOIN logged l USING (day, service)
+    ORDER BY d.day, d.service;
+"""
+
+
+def reconciliation(start, end, services=None):
+    """Manifest vs delivered vs skipped per day and service, from grouped counts only.
+
+    The manifest size is today's subscribed flats less that day's skips.
+    """
+    services = [s.value for s in (services or Service)]
+    return execute_query(RECONCILIATION_QUERY, {"start": start, "end": end, "services": services},
+                         fetch=True, readonly=True)
+
+
+def view_reconciliation():
+    print("\n🧾 Delivery Reconciliation")
+    try:
+        start = parse_date(input("From date (YYYY-MM-DD): "))
+        end_text = input("To date (YYYY-MM-DD, Enter for same day): ").strip()
+        end = parse_date(end_text) if end_text else start
+        service_text = input("Service (Enter for all): ").strip()
+        services = [Service.parse(service_text)] if service_text else None
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    if end < start or end - start > timedelta(days=366):
+        print("❌ Choose a range of at most one year, from earlier to later.")
+        return
+
+    rows = reconciliation(start, end, services)
+    table = ((r['day'], r['service'], r['manifest'], r['delivered'], r['exceptions'], r['skipped'],
+              r['unaccounted'], r['despite_skip']) for r in rows)
+    render_table(["Date", "Service", "Manifest", "Delivered", "Exceptions", "Skipped",
+                  "Unaccounted", "Delivered Despite Skip"], table)
@@ -0,0 +1,101 @@
+import re
+
+from db import execute_query
+from output import render_table
+
+
+# Resident IDs are six Crockford base-32 characters. Each comes from a sequence
+# value put through a fixed odd-multiplier permutation of 0..2**30, so no two
+# sequence values share an ID and consecutive registrations do not get
+# consecutive-looking IDs.
+ID_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ID_LENGTH = 6
+ID_SPACE = 32 ** ID_LENGTH            # 2**30
+ID_MULTIPLIER = 0x2545F491            # odd, so multiplication mod 2**30 is a bijection
+ID_OFFSET = 0x1B873593
+
+SEARCH_LIMIT = 50
+PHONE_DIGITS = r"regexp_replace(phone, '\D', '', 'g')"
+
+
+# ---------- SCHEMA ----------
+def ensure_identity_schema():
+    """Create the ID sequence and the indexes behind login and resident search."""
+    execute_query("CREATE SEQUENCE IF NOT EXISTS resident_id_seq;")
+    # fails on duplicate resident IDs, which stops the migration until they are resolved
+    execute_query("CREATE UNIQUE INDEX IF NOT EXISTS idx_residents_resident_id ON residents (resident_id);")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_residents_flat_no ON residents (flat_no);")
+    execute_query(f"CREATE INDEX IF NOT EXISTS idx_residents_phone_digits ON residents (({PHONE_DIGITS}));")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_residents_name ON residents (lower(name) text_pattern_ops);")
+
+
+# ---------- IDS ----------
+def encode_resident_id(n):
+    x = (n * ID_MULTIPLIER + ID_OFFSET) % ID_SPACE
+    chars = []
+    for _ in range(ID_LENGTH):
+        x, digit = divmod(x, 32)
+        chars.append(ID_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+def new_resident_id():
+    """Next collision-free resident ID (about a billion before the space wraps)."""
+    rows = execute_query("SELECT nextval('resident_id_seq') AS n;", fetch=True)
+    return encode_resident_id(rows[0]["n"])
+
+
+# ---------- LOOKUP ----------
+RESIDENT_COLUMNS = "resident_id, name, flat_no, phone, approved"
+
+
+def find_by_phone(phone):
+    digits = re.sub(r"\D", "", phone or "")
+    if not digits:
+        return []
+    return execute_query(f"SELECT {RESIDENT_COLUMNS} FROM residents WHERE {PHONE_DIGITS} = %s;",
+                         (digits,), fetch=True, readonly=True)
+
+
+def find_by_flat(flat_no):
+    return execute_query(f"SELECT {RESIDENT_COLUMNS} FROM residents WHERE flat_no = %s ORDER BY name;",
+                         (flat_no.strip(),), fetch=True, readonly=True)
+
+
+def search_residents(term, limit=SEARCH_LIMIT):
+    """Match a term as resident ID, phone, flat number or name prefix.
+
+    Each branch is an equality or prefix test on its own index, so the search
+    does not scan the residents table. IDs match in either case: older IDs are
+    lowercase hex and newer ones uppercase base 32, so the term is tried as typed,
+    upper- and lower-cased.
+    """
+    term = term.strip()
+    prefix = re.sub(r"([\\%_])", r"\\\1", term.lower()) + "%"
+    query = f"""
+        SELECT {RESIDENT_COLUMNS} FROM residents WHERE resident_id IN (%(term)s, %(upper)s, %(lower)s)
+        UNION
+        SELECT {RESIDENT_COLUMNS} FROM residents WHERE {PHONE_DIGITS} = %(digits)s AND %(digits)s <> ''
+        UNION
+        SELECT {RESIDENT_COLUMNS} FROM residents WHERE flat_no = %(term)s
+        UNION
+        SELECT {RESIDENT_COLUMNS} FROM residents WHERE lower(name) LIKE %(prefix)s
+        ORDER BY flat_no, name
+        LIMIT %(limit)s;
+    """
+    return execute_query(query, {
+        "term": term, "upper": term.upper(), "lower": term.lower(), "digits": re.sub(r"\D", "", term),
+        "prefix": prefix, "limit": limit,
+    }, fetch=True, readonly=True)
+
+
+def search_residents_flow():
+    term = input("Search by resident ID, phone, flat or name: ").strip()
+    if not term:
+        print("❌ Enter something to search for.")
+        return
+    rows = search_residents(term)
+    if not render_table(["Resident ID", "Name", "Flat", "Phone", "Approved"],
+                        ((r['resident_id'], r['name'], r['flat_no'], r['phone'], "yes" if r['approved'] else "no")
+                         for r in rows)):
+        print("ℹ️ No residents found.")
@@ -1,58 +1,28 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
-
-
-# ---------- DATABASE CONNECTION ----------
-def get_db():
-    """Connect to PostgreSQL database."""
-    return psycopg2.connect(
-        host="localhost",      # change this to your host
-        database="society_db", # change this to your database name
-        user="postgres",       # change this to your username
-        password="admin",      # change this to your password
-        port=5432
-    )
-
-
-# ---------- HELPER FUNCTION ----------
-def execute_query(query, params=None, fetch=False, many=False):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        if many:
-            cur.executemany(query, params)
-        else:
-            cur.execute(query, params)
-        if fetch:
-            data = cur.fetchall()
-        else:
-            data = None
-        conn.commit()
-        return data
-    finally:
-        cur.close()
-        conn.close()
+from contextlib import closing
+from notifications import watch_assigned_tasks
+from queries import execute_prepared
+from records import ComplaintRow, TaskRow, columns
+from db import execute_query, stream_records
+from output import render_table
+from models import TaskStatus, ComplaintStatus, TaskStatusUpdate, parse_date, parse_id, require, ValidationError
+from concurrency import update_status, current_state, StatusConflict
 
 
 # ---------- VIEW COMMON TASKS ----------
 def view_common_tasks():
     print("\n--- Common Society Maintenance Tasks ---")
-    query = "SELECT * FROM maintenance_tasks WHERE is_common = TRUE;"
-    tasks = execute_query(query, fetch=True)
-    if not tasks:
+    query = f"SELECT {columns(TaskRow)} FROM maintenance_tasks WHERE is_common = TRUE ORDER BY created_at;"
+    with closing(stream_records(TaskRow, query, readonly=True)) as tasks:
+        shown = render_table(["Task", "Description", "Status", "Created At"],
+                             ((t.task_name, t.description, t.status, t.created_at) for t in tasks))
+    if not shown:
         print("No common tasks found.")
-        return
-    for task in tasks:
-        print(f"🛠 Task: {task['task_name']} | Description: {task['description']} | "
-              f"Status: {task['status']} | Created At: {task['created_at']}")
 
 
 # ---------- VIEW TASKS ASSIGNED TO STAFF ----------
 def view_assigned_tasks_for_staff(staff_username):
     print(f"\n📋 Tasks assigned to: {staff_username}")
-    query = "SELECT * FROM maintenance_tasks WHERE assigned_to = %s;"
-    tasks = execute_query(query, (staff_username,), fetch=True)
+    tasks = execute_prepared("tasks_for_staff", (staff_username,), readonly=True)
 
     if not tasks:
         print("ℹ️ No tasks assigned yet.")
@@ -70,8 +40,7 @@ def view_assigned_tasks_for_staff(staff_username):
 def view_maintenance_tasks(staff_name):
     """View maintenance tasks assigned to a specific staff member."""
     print(f"\n🧰 Maintenance Tasks assigned to: {staff_name}")
-    query = "SELECT * FROM maintenance_tasks WHERE assigned_to = %s;"
-    tasks = execute_query(query, (staff_name,), fetch=True)
+    tasks = execute_prepared("tasks_for_staff", (staff_name,))
 
     if not tasks:
         print("ℹ️ No maintenance tasks found.")
@@ -89,11 +58,47 @@ def view_maintenance_tasks(staff_name):
 
 
 # ---------- UPDATE TASK STATUS ----------
-def update_task_status(task_id, new_status):
-    """Update the status of a maintenance task."""
-    query = "UPDATE maintenance_tasks SET status = %s WHERE id = %s;"
-    execute_query(query, (new_status, task_id))
-    print(f"✅ Task {task_id} updated to status '{new_status}'.")
+def update_task_status(task_id, new_status, expected_version=None):
+    """Update the status of a maintenance task.
+
+    `expected_version` is the version the user was shown; when omitted the
+    current version is read first, which still guards against a concurrent write.
+    """
+    try:
+        update = TaskStatusUpdate.parse(task_id, new_status)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+
+    if expected_version is None:
+        state = current_state("maintenance_tasks", update.task_id)
+        if not state:
+            print(f"❌ Task {update.task_id} not found.")
+            return
+        expected_version = state['version']
+
+    try:
+        update_status("maintenance_tasks", update.task_id, expected_version, update.status)
+        print(f"✅ Task {update.task_id} updated to status '{update.status}'.")
+    except StatusConflict as e:
+        print(f"⚠️ {e}")
+
+
+def prompt_task_status_update():
+    """Show a task's current status, then apply the new one against the version shown."""
+    try:
+        task_id = parse_id(input("Enter Task ID to update: "), "Task ID")
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    state = current_state("maintenance_tasks", task_id)
+    if not state:
+        print(f"❌ Task {task_id} not found.")
+        return
+
+    print(f"Current status: {state['status']}")
+    new_status = input("Enter new status (Pending/In Progress/Completed): ")
+    update_task_status(task_id, new_status, expected_version=state['version'])
 
 
 # ---------- UPDATE COMMON TASK STATUS ----------
@@ -101,37 +106,70 @@ def update_common_task_status():
     task_name = input("Enter the task name: ").strip()
     staff_name = input("Enter the staff name: ").strip()
     new_status = input("Enter the new status (Pending/In Progress/Completed): ").strip()
+    try:
+        task_name = require(task_name, "Task name")
+        staff_name = require(staff_name, "Staff name")
+        new_status = TaskStatus.parse(new_status)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
 
     query = """
-        UPDATE maintenance_tasks
-        SET status = %s
-        WHERE task_name = %s AND assigned_to = %s AND is_common = TRUE;
+        SELECT id, status, version, created_at FROM maintenance_tasks
+        WHERE task_name = %s AND assigned_to = %s AND is_common = TRUE
+        ORDER BY created_at;
     """
-    execute_query(query, (new_status, task_name, staff_name))
-    print(f"✅ Task '{task_name}' updated to {new_status}")
+    tasks = execute_query(query, (task_name, staff_name), fetch=True)
+    if not tasks:
+        print(f"❌ No common task '{task_name}' assigned to {staff_name}.")
+        return
+
+    task = tasks[0]
+    if len(tasks) > 1:
+        # the name is not unique: make the user pick one row rather than updating them all
+        for t in tasks:
+            print(f"- Task ID {t['id']} | Status: {t['status']} | Created At: {t['created_at']}")
+        picked = input("Several tasks match. Enter the Task ID to update: ").strip()
+        task = next((t for t in tasks if str(t['id']) == picked), None)
+        if task is None:
+            print("❌ Invalid Task ID.")
+            return
+
+    try:
+        update_status("maintenance_tasks", task['id'], task['version'], new_status)
+        print(f"✅ Task '{task_name}' updated to {new_status}")
+    except StatusConflict as e:
+        print(f"⚠️ {e}")
 
 
 # ---------- VIEW COMPLAINTS BY DATE ----------
 def view_complaints(complaint_date):
-    query = "SELECT * FROM complaints WHERE date = %s;"
-    complaints = execute_query(query, (complaint_date,), fetch=True)
-    print(f"\n--- Complaints on {complaint_date} ---")
-
-    if not complaints:
-        print("❌ No complaints found on this date.")
+    try:
+        complaint_date = parse_date(complaint_date)
+    except ValidationError as e:
+        print(f"❌ {e}")
         return
 
-    for c in complaints:
-        print(f"Flat: {c['flat_no']} | Category: {c['category']} | "
-              f"Issue: {c['description']} | Status: {c['status']}")
+    query = f"SELECT {columns(ComplaintRow)} FROM complaints WHERE date = %s ORDER BY flat_no;"
+    print(f"\n--- Complaints on {complaint_date} ---")
+    with closing(stream_records(ComplaintRow, query, (complaint_date,), readonly=True)) as complaints:
+        shown = render_table(["Flat", "Category", "Issue", "Status"],
+                             ((c.flat_no, c.category, c.description, c.status) for c in complaints))
+    if not shown:
+        print("❌ No complaints found on this date.")
 
 
 # ---------- UPDATE COMPLAINT STATUS ----------
 def update_complaint_status():
     flat_no = input("Enter Flat No of the complaint: ").strip()
     complaint_date = input("Enter Date of complaint (YYYY-MM-DD): ").strip()
+    try:
+        complaint_date = parse_date(complaint_date)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
 
-    query_find = "SELECT * FROM complaints WHERE flat_no = %s AND date = %s;"
+    query_find = "SELECT id, category, description, status, version FROM complaints WHERE flat_no = %s AND date = %s;"
     complaints = execute_query(query_find, (flat_no, complaint_date), fetch=True)
 
     if not complaints:
@@ -139,19 +177,33 @@ def update_complaint_status():
         return
 
     complaint = complaints[0]
+    if len(complaints) > 1:
+        for c in complaints:
+            print(f"- ID {c['id']} | {c['category']} | {c['description']} | {c['status']}")
+        picked = input("Several complaints match. Enter the complaint ID: ").strip()
+        complaint = next((c for c in complaints if str(c['id']) == picked), None)
+        if complaint is None:
+            print("❌ Invalid complaint ID.")
+            return
+
     print(f"\nComplaint Found:")
     print(f"Category: {complaint['category']}")
     print(f"Issue: {complaint['description']}")
     print(f"Status: {complaint['status']}")
 
     new_status = input("Enter new status (Pending / In Progress / Resolved): ").strip()
-    query_update = """
-        UPDATE complaints
-        SET status = %s, updated_at = %s
-        WHERE id = %s;
-    """
-    execute_query(query_update, (new_status, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), complaint['id']))
-    print(f"✅ Complaint status updated to '{new_status}'")
+    try:
+        new_status = ComplaintStatus.parse(new_status)
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+
+    try:
+        update_status("complaints", complaint['id'], complaint['version'], new_status,
+                      extra_sql=", updated_at = LOCALTIMESTAMP")
+        print(f"✅ Complaint status updated to '{new_status}'")
+    except StatusConflict as e:
+        print(f"⚠️ {e}")
 
 
 # ---------- MAIN MENU FOR MAINTENANCE STAFF ----------
@@ -163,7 +215,8 @@ def maintenance_menu(staff_name):
         print("3. View All Complaints (By Date)")
         print("4. Update Complaint Status")
         print("5. Update Common Task Status")
-        print("6. Logout")
+        print("6. Watch My Assigned Tasks (live)")
+        print("7. Logout")
 
         choice = input("Enter your choice: ").strip()
 
@@ -179,6 +232,8 @@ def maintenance_menu(staff_name):
         elif choice == "5":
             update_common_task_status()
         elif choice == "6":
+            watch_assigned_tasks(staff_name)
+        elif choice == "7":
             print("Logging out...")
             break
         else:
@@ -0,0 +1,99 @@
+import sys
+
+from db import execute_query, tenant_scope
+from notifications import install_notify_triggers
+from announcements import ensure_announcement_schema
+from dashboard import ensure_dashboard_indexes
+from sla import ensure_sla_schema
+from polls import ensure_poll_schema
+from concurrency import ensure_version_columns, ensure_idempotency_keys
+from deliveries import ensure_delivery_log, ensure_route_schema
+from billing import ensure_billing_schema
+from analytics import ensure_analytics_schema
+from security import ensure_security_schema
+from identity import ensure_identity_schema
+from audit import ensure_audit_schema
+from aminity import ensure_amenity_catalogue
+from tenants import ensure_society_registry, society_schemas, set_schema_version
+
+
+# ---------- SEED DATA ----------
+def seed_admin():
+    """Insert or update admin credentials."""
+    query = """
+        INSERT INTO admins (username, password)
+        VALUES (%s, %s)
+        ON CONFLICT (username)
+        DO UPDATE SET password = EXCLUDED.password;
+    """
+    execute_query(query, ("admin", "admin123"))
+
+
+def seed_staff():
+    staff = [
+        ("delivery1", "pass123", "delivery"),
+        ("maintenance1", "pass456", "maintenance"),
+        ("maintenance2", "pass890", "maintenance"),
+        ("maintenance5", "pass234", "maintenance"),
+        ("security1", "pass789", "security")
+    ]
+    query = """
+        INSERT INTO staff (username, password, role)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (username) DO NOTHING;
+    """
+    execute_query(query, staff, many=True)
+
+
+# ---------- MIGRATIONS ----------
+# Run in order inside each society's schema. Every step is safe to repeat, so a
+# run that fails part-way (e.g. on a lock timeout) can simply be started again.
+# The DDL takes table locks, which is why it runs here once rather than at login.
+TENANT_STEPS = (
+    seed_admin,
+    seed_staff,
+    install_notify_triggers,
+    ensure_announcement_schema,
+    ensure_dashboard_indexes,
+    ensure_sla_schema,
+    ensure_poll_schema,
+    ensure_version_columns,
+    ensure_idempotency_keys,
+    ensure_delivery_log,
+    ensure_route_schema,
+    ensure_billing_schema,
+    ensure_analytics_schema,
+    ensure_security_schema,
+    ensure_identity_schema,
+    ensure_audit_schema,
+    ensure_amenity_catalogue,
+)
+
+
+def migrate_society(schema):
+    """Create or update every table, index and trigger in one society's schema.
+
+    The society is marked as being at SCHEMA_VERSION only after every step has
+    run, so a failed run leaves it unavailable at sign-in rather than half set up.
+    """
+    with tenant_scope(schema):
+        for step in TENANT_STEPS:
+            step()
+    set_schema_version(schema)
+
+
+def migrate():
+    """Set up the society registry, then bring every society's schema up to date."""
+    ensure_society_registry()
+    for schema in society_schemas():
+        print(f"🔧 Migrating {schema} ...")
+        migrate_society(schema)
+    print("✅ Database is up to date.")
+
+
+if __name__ == "__main__":
+    try:
+        migrate()
+    except Exception as e:
+        print("❌ Migration failed:", e)
+        sys.exit(1)
@@ -0,0 +1,250 @@
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from enum import Enum
+
+
+class ValidationError(ValueError):
+    """Raised when user input is rejected before it reaches the database."""
+
+
+# ---------- ENUMS ----------
+class _Choice(str, Enum):
+    """String enum that accepts its values case-insensitively."""
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str):
+            for member in cls:
+                if member.value.lower() == value.strip().lower():
+                    return member
+        return None
+
+    @classmethod
+    def parse(cls, text):
+        try:
+            return cls(text)
+        except ValueError:
+            choices = "/".join(m.value for m in cls)
+            label = " ".join(re.findall("[A-Z][a-z]*", cls.__name__)).lower()
+            raise ValidationError(f"Invalid {label}: '{text}'. Choose from {choices}.") from None
+
+    def __str__(self):
+        return self.value
+
+
+class TaskStatus(_Choice):
+    PENDING = "Pending"
+    IN_PROGRESS = "In Progress"
+    COMPLETED = "Completed"
+
+
+class ComplaintStatus(_Choice):
+    PENDING = "Pending"
+    ASSIGNED = "Assigned"
+    IN_PROGRESS = "In Progress"
+    RESOLVED = "Resolved"
+
+
+class BookingStatus(_Choice):
+    PENDING = "pending"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+
+
+class Service(_Choice):
+    MILK = "milk"
+    WATER = "water"
+    GAS = "gas"
+    NEWSPAPER = "newspaper"
+
+
+class StaffRole(_Choice):
+    DELIVERY = "delivery"
+    MAINTENANCE = "maintenance"
+    SECURITY = "security"
+
+
+# ---------- STATE MACHINES ----------
+# status -> statuses it may move to; anything else is rejected by the update itself
+TASK_TRANSITIONS = {
+    TaskStatus.PENDING: {TaskStatus.IN_PROGRESS},
+    TaskStatus.IN_PROGRESS: {TaskStatus.COMPLETED},
+    TaskStatus.COMPLETED: set(),
+}
+
+COMPLAINT_TRANSITIONS = {
+    ComplaintStatus.PENDING: {ComplaintStatus.ASSIGNED, ComplaintStatus.IN_PROGRESS},
+    ComplaintStatus.ASSIGNED: {ComplaintStatus.IN_PROGRESS},
+    ComplaintStatus.IN_PROGRESS: {ComplaintStatus.RESOLVED},
+    ComplaintStatus.RESOLVED: set(),
+}
+
+
+def allowed_sources(transitions, new_status):
+    """The statuses from which `new_status` may be reached."""
+    return [source.value for source, targets in transitions.items() if new_status in targets]
+
+
+# ---------- FIELD PARSERS ----------
+def parse_date(text):
+    try:
+        return datetime.strptime(text.strip(), "%Y-%m-%d").date()
+    except (ValueError, AttributeError):
+        raise ValidationError("Invalid date format. Use YYYY-MM-DD.") from None
+
+
+def parse_month(text):
+    """'2026-03' -> date(2026, 3, 1)."""
+    try:
+        return datetime.strptime(text.strip(), "%Y-%m").date()
+    except (ValueError, AttributeError):
+        raise ValidationError("Invalid month format. Use YYYY-MM.") from None
+
+
+TIME_FORMATS = ("%H:%M", "%I%p", "%I:%M%p")
+
+
+def parse_time(text):
+    """'17:00', '5PM', '5:30 pm' -> time."""
+    cleaned = str(text or "").strip().upper().replace(" ", "")
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).time()
+        except ValueError:
+            continue
+    raise ValidationError("Invalid time. Use HH:MM or e.g. 5PM.")
+
+
+def parse_id(text, what="ID"):
+    text = str(text).strip()
+    if not text.isdigit():
+        raise ValidationError(f"{what} must be a number.")
+    return int(text)
+
+
+def require(text, what):
+    text = (text or "").strip()
+    if not text:
+        raise ValidationError(f"{what} cannot be empty.")
+    return text
+
+
+# "A-1203", "A1203", "T2/0704" or "101": optional tower, then floor and a two-digit unit
+FLAT_PATTERN = re.compile(r"^\s*(?:(?P<tower>[A-Za-z0-9]+)\s*[-/ ]\s*|(?P<letter>[A-Za-z]+))?(?P<number>\d+)\s*$")
+
+
+@dataclass(frozen=True, order=True)
+class FlatKey:
+    """Sortable position of a flat: tower, then floor, then unit."""
+    __slots__ = ("tower", "floor", "unit")
+    tower: str
+    floor: int
+    unit: int
+
+
+def parse_flat(text):
+    match = FLAT_PATTERN.match(text or "")
+    if not match:
+        raise ValidationError(f"Unrecognised flat number '{text}'. Use e.g. A-1203 or 101.")
+    number = int(match.group("number"))
+    tower = (match.group("tower") or match.group("letter") or "").upper()
+    return FlatKey(tower, number // 100, number % 100)
+
+
+def parse_range(text, what="Range"):
+    """'3-7' -> (3, 7); '5' -> (5, 5)."""
+    low, _, high = (text or "").partition("-")
+    low = parse_id(low, what)
+    high = parse_id(high, what) if high.strip() else low
+    if high < low:
+        raise ValidationError(f"{what} must run from low to high.")
+    return low, high
+
+
+# ---------- REQUESTS ----------
+@dataclass(frozen=True)
+class NewComplaint:
+    __slots__ = ("flat_no", "category", "description", "date")
+    flat_no: str
+    category: str
+    description: str
+    date: date
+
+    @classmethod
+    def parse(cls, flat_no, category, description, complaint_date):
+        complaint_date = parse_date(complaint_date)
+        today = date.today()
+        if complaint_date != today:
+            raise ValidationError(f"Complaint date must be today's date ({today}).")
+        return cls(require(flat_no, "Flat number"), require(category, "Category"),
+                   require(description, "Description"), complaint_date)
+
+
+@dataclass(frozen=True)
+class DeliverySkip:
+    __slots__ = ("flat_no", "item", "skip_date")
+    flat_no: str
+    item: Service
+    skip_date: date
+
+    @classmethod
+    def parse(cls, flat_no, item, skip_date):
+        skip_date = parse_date(skip_date)
+        if skip_date <= date.today():
+            raise ValidationError("Skip date must be a future date.")
+        return cls(require(flat_no, "Flat number"), Service.parse(item), skip_date)
+
+
+@dataclass(frozen=True)
+class AmenityBooking:
+    __slots__ = ("resident_id", "amenity", "date", "time")
+    resident_id: str
+    amenity: str
+    date: date
+    time: str
+
+    @classmethod
+    def parse(cls, resident_id, amenity, booking_date, booking_time):
+        booking_date = parse_date(booking_date)
+        if booking_date < date.today():
+            raise ValidationError("That date has already passed. Please choose a future date.")
+        return cls(require(resident_id, "Resident ID"), require(amenity, "Amenity"),
+                   booking_date, f"{parse_time(require(booking_time, 'Booking time')):%H:%M}")
+
+
+@dataclass(frozen=True)
+class TaskAssignment:
+    __slots__ = ("complaint_id", "assigned_to", "due_date")
+    complaint_id: int
+    assigned_to: str
+    due_date: date
+
+    @classmethod
+    def parse(cls, complaint_id, assigned_to, due_date):
+        due_date = parse_date(due_date)
+        if due_date < date.today():
+            raise ValidationError("Due date cannot be in the past.")
+        return cls(parse_id(complaint_id, "Complaint ID"), require(assigned_to, "Staff username"), due_date)
+
+
+@dataclass(frozen=True)
+class TaskStatusUpdate:
+    __slots__ = ("task_id", "status")
+    task_id: int
+    status: TaskStatus
+
+    @classmethod
+    def parse(cls, task_id, status):
+        return cls(parse_id(task_id, "Task ID"), TaskStatus.parse(status))
+
+
+@dataclass(frozen=True)
+class SkipQuery:
+    __slots__ = ("skip_date", "item")
+    skip_date: date
+    item: Service
+
+    @classmethod
+    def parse(cls, skip_date, item):
+        return cls(parse_date(skip_date), Service.parse(item))
@@ -0,0 +1,216 @@
+import json
+import select
+from datetime import date
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+from db import get_db, execute_query, ensure_trigger, current_tenant
+from models import Service, ValidationError
+
+
+# ---------- CHANNELS ----------
+# Triggers notify on "<schema>_<channel>" so listeners only hear their own society.
+ANNOUNCEMENT_CHANNEL = "society_announcements"
+TASK_CHANNEL = "society_tasks"
+SKIP_CHANNEL = "society_skips"
+
+# table -> (channel, trigger events)
+NOTIFY_TABLES = {
+    "announcements": (ANNOUNCEMENT_CHANNEL, "INSERT OR DELETE"),
+    "maintenance_tasks": (TASK_CHANNEL, "INSERT OR UPDATE OR DELETE"),
+    "skip_delivery": (SKIP_CHANNEL, "INSERT OR DELETE"),
+}
+
+# NOTIFY payloads are capped at 8000 bytes; larger rows are sent as id only.
+MAX_PAYLOAD_BYTES = 7900
+POLL_TIMEOUT = 5
+
+
+# ---------- TRIGGER SETUP ----------
+def install_notify_triggers():
+    """Create the trigger function and attach it to every watched table."""
+    function_sql = f"""
+        CREATE OR REPLACE FUNCTION notify_society_change() RETURNS trigger AS $$
+        DECLARE
+            changed RECORD;
+            payload TEXT;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed := OLD;
+            ELSE
+                changed := NEW;
+            END IF;
+
+            payload := json_build_object(
+                'table', TG_TABLE_NAME, 'op', TG_OP, 'row', row_to_json(changed)
+            )::text;
+            IF octet_length(payload) > {MAX_PAYLOAD_BYTES} THEN
+                payload := json_build_object(
+                    'table', TG_TABLE_NAME, 'op', TG_OP, 'id', row_to_json(changed)->'id'
+                )::text;
+            END IF;
+
+            PERFORM pg_notify(TG_TABLE_SCHEMA || '_' || TG_ARGV[0], payload);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """
+    execute_query(function_sql)
+
+    for table, (channel, events) in NOTIFY_TABLES.items():
+        ensure_trigger(table, f"{table}_notify", f"""
+            AFTER {events} ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE notify_society_change('{channel}')
+        """)
+
+
+def tenant_channel(channel):
+    return f"{current_tenant()}_{channel}"
+
+
+# ---------- LISTENER ----------
+class ChangeFeed:
+    """A dedicated LISTEN connection that returns decoded change events."""
+
+    def __init__(self, *channels):
+        self.conn = get_db()
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        cur = self.conn.cursor()
+        for channel in channels:
+            cur.execute(f"LISTEN {tenant_channel(channel)};")
+        cur.close()
+
+    def poll(self, timeout=POLL_TIMEOUT):
+        """Wait up to `timeout` seconds and return the events that arrived."""
+        if select.select([self.conn], [], [], timeout) == ([], [], []):
+            return []
+        self.conn.poll()
+        events = []
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            event = json.loads(notify.payload)
+            if "row" not in event:
+                event["row"] = _fetch_row(event["table"], event["id"], event["op"])
+            events.append(event)
+        return events
+
+    def close(self):
+        self.conn.close()
+
+
+def _fetch_row(table, row_id, op):
+    """Load a row whose payload was too large to ship in the notification."""
+    if op == "DELETE" or table not in NOTIFY_TABLES:
+        return {"id": row_id}
+    rows = execute_query(f"SELECT * FROM {table} WHERE id = %s;", (row_id,), fetch=True)
+    return rows[0] if rows else {"id": row_id}
+
+
+# ---------- LOCAL VIEW ----------
+class LiveView:
+    """Rows keyed by id, kept current by applying change events."""
+
+    def __init__(self, rows, key="id", matches=None):
+        self.key = key
+        self.matches = matches or (lambda row: True)
+        self.rows = {row[key]: row for row in rows}
+
+    def apply(self, event):
+        """Apply one event; return 'added', 'updated', 'removed' or None."""
+        row = event["row"]
+        row_key = row.get(self.key)
+        known = row_key in self.rows
+
+        if event["op"] == "DELETE" or not self.matches(row):
+            if known:
+                del self.rows[row_key]
+                return "removed"
+            return None
+
+        self.rows[row_key] = row
+        return "updated" if known else "added"
+
+
+def _watch(feed, view, render):
+    print("👀 Watching for changes... press Ctrl+C to stop.")
+    try:
+        while True:
+            for event in feed.poll():
+                change = view.apply(event)
+                if change:
+                    render(change, event["row"])
+    except KeyboardInterrupt:
+        print("\n🔙 Stopped watching.")
+    finally:
+        feed.close()
+
+
+# ---------- WATCH ANNOUNCEMENTS ----------
+def watch_announcements():
+    """Show current announcements once, then print new ones as they arrive."""
+    feed = ChangeFeed(ANNOUNCEMENT_CHANNEL)
+    rows = execute_query("""
+        SELECT * FROM announcements
+        WHERE expires_at IS NULL OR expires_at > LOCALTIMESTAMP
+        ORDER BY created_at DESC LIMIT 10;
+    """, fetch=True)
+    view = LiveView(rows)
+
+    print("\n📢 Latest Announcements")
+    for a in rows:
+        print(f"🕒 {a['created_at']:%Y-%m-%d %H:%M} | 📢 {a['message']}")
+
+    def render(change, a):
+        if change == "removed":
+            print(f"🗑️ Announcement {a['id']} was withdrawn.")
+        else:
+            print(f"🆕 📢 {a.get('message')}")
+
+    _watch(feed, view, render)
+
+
+# ---------- WATCH ASSIGNED TASKS ----------
+def watch_assigned_tasks(staff_username):
+    """Show tasks assigned to a staff member and follow assignments live."""
+    feed = ChangeFeed(TASK_CHANNEL)
+    rows = execute_query("SELECT * FROM maintenance_tasks WHERE assigned_to = %s;", (staff_username,), fetch=True)
+    view = LiveView(rows, matches=lambda t: t.get("assigned_to") == staff_username)
+
+    print(f"\n📋 {len(rows)} task(s) currently assigned to {staff_username}")
+
+    def render(change, t):
+        label = t.get("issue") or t.get("task_name")
+        if change == "added":
+            print(f"🆕 Task {t['id']} assigned: {label} | Due: {t.get('due_date')}")
+        elif change == "updated":
+            print(f"🔄 Task {t['id']} now '{t.get('status')}': {label}")
+        else:
+            print(f"🗑️ Task {t['id']} is no longer assigned to you.")
+
+    _watch(feed, view, render)
+
+
+# ---------- WATCH SKIPS ----------
+def watch_skips(service_type):
+    """Show today's skips for a service and follow new skips live."""
+    try:
+        service_type = Service.parse(service_type).value
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    today = str(date.today())
+    feed = ChangeFeed(SKIP_CHANNEL)
+    rows = execute_query("SELECT * FROM skip_delivery WHERE skip_date = %s AND item = %s;",
+                         (today, service_type), fetch=True)
+    view = LiveView(rows, key="flat_no",
+                    matches=lambda s: str(s.get("skip_date")) == today and s.get("item") == service_type)
+
+    print(f"\n📌 {len(rows)} {service_type} skip(s) for {today}")
+
+    def render(change, s):
+        if change == "removed":
+            print(f"↩️ Flat {s['flat_no']} cancelled its skip.")
+        else:
+            print(f"🆕 Flat {s['flat_no']} skipped {service_type}.")
+
+    _watch(feed, view, render)
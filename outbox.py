@@ -0,0 +1,244 @@
+import atexit
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+import config
+from concurrency import new_idempotency_key
+from db import get_db, current_tenant, tenant_scope
+from resilience import DatabaseUnavailable, is_transient
+
+
+# ---------- QUEUED WRITES ----------
+# Every kind is a keyed insert, so a row sent twice (e.g. by two terminals
+# sharing a queue file, or a commit whose acknowledgement was lost) is stored once.
+# A `guard` is (SQL that locks what the insert's condition reads, payload field
+# passed to it as an array); rows a guarded insert skips are reported as refused.
+Write = namedtuple("Write", "table sql template guard", defaults=(None,))
+
+WRITES = {
+    "complaint": Write("complaints", """
+        INSERT INTO complaints (flat_no, category, description, date, status, idempotency_key) VALUES %s
+        ON CONFLICT (idempotency_key, date) DO NOTHING
+    """, "(%(flat_no)s, %(category)s, %(description)s, %(date)s::date, 'Pending', %(key)s)"),
+    "skip": Write("skip_delivery", """
+        INSERT INTO skip_delivery (flat_no, item, skip_date, idempotency_key) VALUES %s
+        ON CONFLICT (idempotency_key, skip_date) DO NOTHING
+    """, "(%(flat_no)s, %(item)s, %(skip_date)s::date, %(key)s)"),
+    # a booking is stored only while its slot has a free place, counting the
+    # earlier bookings of the same batch; places are counted by slot_start, as
+    # aminity.SlotOccupancy counts them
+    "booking": Write("amenity_bookings", """
+        INSERT INTO amenity_bookings (resident_id, amenity, date, time, slot_start, status, idempotency_key)
+        SELECT v.resident_id, v.amenity, v.date, v.time, v.time::time, v.status, v.key
+        FROM (
+            SELECT v.*, a.capacity,
+                   row_number() OVER (PARTITION BY v.amenity, v.date, v.time::time ORDER BY v.seq) AS place
+            FROM (VALUES %s) AS v(seq, resident_id, amenity, date, time, status, key)
+            JOIN amenities a ON a.name = v.amenity
+        ) v
+        WHERE v.place + (
+            SELECT count(*) FROM amenity_bookings b
+            WHERE b.amenity = v.amenity AND b.date = v.date AND b.slot_start = v.time::time
+              AND b.status IN ('pending', 'approved')
+        ) <= v.capacity
+        ON CONFLICT (idempotency_key, date) DO NOTHING
+    """, "(%(seq)s, %(resident_id)s, %(amenity)s, %(date)s::date, %(time)s, %(status)s, %(key)s)",
+        guard=("SELECT 1 FROM amenities WHERE name = ANY(%s) ORDER BY name FOR UPDATE", "amenity")),
+}
+
+QueuedRow = namedtuple("QueuedRow", "seq key tenant kind payload")
+
+
+class Outbox(threading.Thread):
+    """A durable local queue of resident writes, drained to Postgres in the background.
+
+    enqueue() commits the row to a SQLite file on this machine and returns at
+    once, so the user is answered without waiting on (or for) the database.
+    The flusher sends queued rows in one transaction per society and deletes
+    them only after that commit. A row Postgres rejects outright is kept in the
+    file with its error instead of blocking the rows behind it.
+    """
+
+    def __init__(self, path, interval, batch):
+        super().__init__(daemon=True, name="outbox-flusher")
+        self.path = path
+        self.interval = interval
+        self.batch = batch
+        self.offline = False
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        with self._open() as local:
+            local.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL UNIQUE,
+                    tenant TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    queued_at TEXT NOT NULL,
+                    error TEXT
+                )
+            """)
+        atexit.register(self.stop)
+
+    @contextmanager
+    def _open(self):
+        """A SQLite connection to the queue file, committed on success and always closed."""
+        local = sqlite3.connect(self.path, timeout=10)
+        try:
+            local.execute("PRAGMA journal_mode = WAL")
+            local.execute("PRAGMA synchronous = FULL")     # an acknowledged write survives a power cut
+            with local:
+                yield local
+        finally:
+            local.close()
+
+    # ---------- QUEUE ----------
+    def enqueue(self, kind, row, key=None):
+        """Queue one write for the current society; return its idempotency key."""
+        key = key or new_idempotency_key()
+        payload = json.dumps({**row, "key": key}, default=str)
+        with self._open() as local:
+            local.execute(
+                "INSERT OR IGNORE INTO outbox (key, tenant, kind, payload, queued_at) VALUES (?, ?, ?, ?, ?)",
+                (key, current_tenant(), kind, payload, datetime.now().isoformat(timespec="seconds")),
+            )
+        self.wake.set()
+        return key
+
+    def pending(self, kind=None):
+        """Rows still waiting to be sent (rejected rows are not counted)."""
+        with self._open() as local:
+            query = "SELECT count(*) FROM outbox WHERE error IS NULL"
+            if kind:
+                return local.execute(query + " AND kind = ?", (kind,)).fetchone()[0]
+            return local.execute(query).fetchone()[0]
+
+    def _next_batch(self):
+        with self._open() as local:
+            rows = local.execute("""
+                SELECT seq, key, tenant, kind, payload FROM outbox
+                WHERE error IS NULL ORDER BY seq LIMIT ?
+            """, (self.batch,)).fetchall()
+        return [QueuedRow(*row) for row in rows]
+
+    def _forget(self, rows):
+        with self._open() as local:
+            local.executemany("DELETE FROM outbox WHERE seq = ?", [(r.seq,) for r in rows])
+
+    def _reject(self, row, error):
+        with self._open() as local:
+            local.execute("UPDATE outbox SET error = ? WHERE seq = ?", (str(error), row.seq))
+        print(f"\n⚠️ Queued {row.kind} {row.key[:8]} was rejected by the database: {error}")
+
+    # ---------- FLUSH ----------
+    def _send(self, rows):
+        """Insert rows of one society in a single transaction; return the keys a guard refused."""
+        by_kind = {}
+        for row in rows:
+            by_kind.setdefault(row.kind, []).append(dict(json.loads(row.payload), seq=row.seq))
+        refused = []
+        conn = get_db()
+        cur = conn.cursor()
+        try:
+            for kind, payloads in by_kind.items():
+                write = WRITES[kind]
+                if write.guard:
+                    # locked in its own statement so the insert's snapshot sees every
+                    # row committed before the lock was granted
+                    guard_sql, field = write.guard
+                    cur.execute(guard_sql, (sorted({p[field] for p in payloads}),))
+                execute_values(cur, write.sql, payloads, template=write.template, page_size=self.batch)
+                if write.guard:
+                    cur.execute(f"""
+                        SELECT k FROM unnest(%s::text[]) AS k
+                        WHERE NOT EXISTS (SELECT 1 FROM {write.table} t WHERE t.idempotency_key = k);
+                    """, ([p["key"] for p in payloads],))
+                    refused += [k for (k,) in cur.fetchall()]
+            conn.commit()
+            return refused
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            conn.close()
+
+    def _send_society(self, tenant, rows):
+        """Send one society's rows; return how many were written.
+
+        Connection trouble is raised so the rows stay queued. If Postgres refuses
+        the batch itself, the rows are sent one at a time and only the offending
+        ones are marked rejected.
+        """
+        with tenant_scope(tenant):
+            try:
+                refused = set(self._send(rows))
+            except Exception as e:
+                if isinstance(e, DatabaseUnavailable) or is_transient(e):
+                    raise
+                if len(rows) == 1:
+                    self._reject(rows[0], e)
+                    return 0
+                return sum(self._send_society(tenant, [row]) for row in rows)
+        self._forget([r for r in rows if r.key not in refused])
+        for row in rows:
+            if row.key in refused:
+                self._reject(row, "no place left in that slot")
+        return len(rows) - len(refused)
+
+    def flush(self):
+        """Send everything queued; return how many rows reached the database."""
+        written = 0
+        with self.flush_lock:
+            while True:
+                rows = self._next_batch()
+                if not rows:
+                    break
+                by_tenant = {}
+                for row in rows:
+                    by_tenant.setdefault(row.tenant, []).append(row)
+                try:
+                    for tenant, tenant_rows in by_tenant.items():
+                        written += self._send_society(tenant, tenant_rows)
+                except Exception as e:
+                    if not self.offline:
+                        print(f"\n⚠️ Database unreachable; {self.pending()} write(s) kept on this terminal: {e}")
+                    self.offline = True
+                    break
+                self.offline = False
+                if len(rows) < self.batch:
+                    break
+        return written
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.flush()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+        self.flush()
+
+
+_outbox = None
+_outbox_lock = threading.Lock()
+
+
+def outbox():
+    """The running outbox, started on first use (which also drains what an earlier session left)."""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox(*config.outbox_settings())
+            _outbox.start()
+    return _outbox
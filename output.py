@@ -0,0 +1,105 @@
+import csv
+import json
+import sys
+from itertools import chain, islice
+
+
+FORMATS = ("table", "json", "csv")
+DEFAULT_FORMAT = "table"
+PAGE_SIZE = 25
+SAMPLE_ROWS = 50       # rows looked at to size columns when no widths are given
+MAX_COL_WIDTH = 40     # longer cells (e.g. descriptions) are truncated
+
+
+def set_default_format(fmt):
+    global DEFAULT_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}'. Choose from: {', '.join(FORMATS)}.")
+    DEFAULT_FORMAT = fmt
+
+
+# ---------- CELL HELPERS ----------
+def _text(value):
+    return "" if value is None else str(value).replace("\n", " ")
+
+
+def _fit(value, width):
+    text = _text(value)
+    if len(text) > width:
+        text = text[:width - 1] + "…"
+    return text.ljust(width)
+
+
+# ---------- SINKS ----------
+def _render_grid(headers, rows, widths, page_size, out):
+    if widths is None:
+        sample = list(islice(rows, SAMPLE_ROWS))
+        widths = [
+            min(MAX_COL_WIDTH, max([len(h)] + [len(_text(r[i])) for r in sample]))
+            for i, h in enumerate(headers)
+        ]
+        rows = chain(sample, rows)
+
+    border = "+" + "+".join("-" * (w + 2) for w in widths) + "+"
+    interactive = page_size and out.isatty() and sys.stdin.isatty()
+    count = 0
+    for row in rows:
+        if count == 0:
+            print(border, file=out)
+            print("| " + " | ".join(_fit(h, w) for h, w in zip(headers, widths)) + " |", file=out)
+            print(border.replace("-", "="), file=out)
+        print("| " + " | ".join(_fit(v, w) for v, w in zip(row, widths)) + " |", file=out)
+        count += 1
+        if interactive and count % page_size == 0:
+            if input("-- More (Enter to continue, q to stop) -- ").strip().lower() == "q":
+                break
+    if count:
+        print(border, file=out)
+    return count
+
+
+def _render_json(headers, rows, out):
+    count = 0
+    for row in rows:
+        out.write("[\n  " if count == 0 else ",\n  ")
+        out.write(json.dumps(dict(zip(headers, row)), default=str))
+        count += 1
+    if count:
+        out.write("\n]\n")
+    return count
+
+
+def _render_csv(headers, rows, out):
+    writer = csv.writer(out)
+    count = 0
+    for row in rows:
+        if count == 0:
+            writer.writerow(headers)
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+# ---------- PUBLIC ----------
+def render_table(headers, rows, widths=None, fmt=None, page_size=PAGE_SIZE, out=None):
+    """Render an iterable of row sequences as they arrive; return how many were written.
+
+    Nothing is printed for an empty iterable, so callers can show their own
+    "nothing found" message when this returns 0. In table format, column widths
+    come from `widths` or from the first SAMPLE_ROWS rows. Interactive terminals
+    page every `page_size` rows.
+    """
+    out = out or sys.stdout
+    fmt = fmt or DEFAULT_FORMAT
+    rows = iter(rows)
+    try:
+        if fmt == "json":
+            return _render_json(headers, rows, out)
+        if fmt == "csv":
+            return _render_csv(headers, rows, out)
+        return _render_grid(headers, rows, widths, page_size, out)
+    finally:
+        # stop a generator source if paging was cut short; a stream_records cursor
+        # behind a generator expression is closed by the caller (contextlib.closing)
+        if hasattr(rows, "close"):
+            rows.close()
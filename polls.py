@@ -0,0 +1,191 @@
+import time
+
+from db import get_db, execute_query, tenant_scope
+from queries import execute_prepared
+from tenants import society_schemas
+from audit import audited, record
+
+
+CLOSE_INTERVAL = 60    # seconds between scheduler sweeps
+SCHEDULER_LOCK = 7301036    # advisory lock key held by the one running scheduler
+
+
+# ---------- SCHEMA ----------
+def ensure_poll_schema():
+    """Create poll_options, key votes by option id and backfill label-keyed polls."""
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS poll_options (
+            id SERIAL PRIMARY KEY,
+            poll_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            label TEXT NOT NULL,
+            votes INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (poll_id, position)
+        );
+    """)
+    execute_query("ALTER TABLE votes ADD COLUMN IF NOT EXISTS option_id INTEGER;")
+    execute_query("CREATE UNIQUE INDEX IF NOT EXISTS idx_votes_poll_flat ON votes (poll_id, flat_no);")
+    execute_query("CREATE TABLE IF NOT EXISTS votes_archive (LIKE votes);")
+    execute_query("""
+        ALTER TABLE polls
+            ADD COLUMN IF NOT EXISTS starts_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+            ADD COLUMN IF NOT EXISTS ends_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS closed_at TIMESTAMP;
+    """)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_polls_open ON polls (ends_at) WHERE status = 'open';")
+
+    # polls created before option ids: copy their labels and jsonb tallies across once
+    execute_query("""
+        INSERT INTO poll_options (poll_id, position, label, votes)
+        SELECT p.id, o.position, o.label, COALESCE((p.votes ->> o.label)::int, 0)
+        FROM polls p
+        CROSS JOIN LATERAL unnest(p.options) WITH ORDINALITY AS o(label, position)
+        WHERE NOT EXISTS (SELECT 1 FROM poll_options po WHERE po.poll_id = p.id);
+    """)
+
+
+# ---------- CREATE ----------
+def create_poll(question, options, starts_at=None, ends_at=None):
+    """Insert a poll and its numbered options in one statement; return the poll id.
+
+    A poll with a future starts_at is listed to residents only once it starts.
+    Without ends_at it stays open until an admin closes it.
+    """
+    query = """
+        WITH p AS (
+            INSERT INTO polls (question, options, status, created_at, starts_at, ends_at)
+            VALUES (%s, %s, 'open', LOCALTIMESTAMP, COALESCE(%s, LOCALTIMESTAMP), %s)
+            RETURNING id
+        )
+        INSERT INTO poll_options (poll_id, position, label)
+        SELECT p.id, o.position, o.label
+        FROM p CROSS JOIN unnest(%s::text[]) WITH ORDINALITY AS o(label, position)
+        RETURNING poll_id;
+    """
+    rows = execute_query(query, (question, options, starts_at, ends_at, options), fetch=True)
+    if not rows:
+        return None
+    poll_id = rows[0]["poll_id"]
+    record("create_poll", f"polls/{poll_id}", after={
+        "id": poll_id, "question": question, "options": options, "starts_at": starts_at, "ends_at": ends_at,
+    })
+    return poll_id
+
+
+# ---------- VOTE ----------
+def open_polls_for(flat_no):
+    """Polls that are live now and that this flat has not voted in (one anti-join)."""
+    return execute_prepared("open_polls_for_flat", (flat_no,))
+
+
+def poll_options(poll_id):
+    return execute_prepared("poll_options", (poll_id,))
+
+
+def record_vote(flat_no, poll_id, option_id):
+    """Record one vote per flat and bump the option's tally atomically.
+
+    Returns False if the flat already voted or the option is not part of the poll.
+    """
+    return bool(execute_prepared("record_vote", (flat_no, poll_id, option_id)))
+
+
+def poll_results():
+    """Open and closed polls with their options and tallies, ordered for display."""
+    query = """
+        SELECT p.id, p.question, p.status, p.ends_at, o.label, o.votes
+        FROM polls p
+        JOIN poll_options o ON o.poll_id = p.id
+        WHERE p.status <> 'archived'
+        ORDER BY p.id, o.position;
+    """
+    return execute_query(query, fetch=True, readonly=True)
+
+
+# ---------- CLOSE / ARCHIVE ----------
+def close_poll(poll_id):
+    rows = audited("close_poll", "polls", "id", """
+        UPDATE polls p SET status = 'closed', closed_at = LOCALTIMESTAMP
+        FROM (SELECT * FROM polls WHERE id = %s AND status = 'open' FOR UPDATE) old
+        WHERE p.id = old.id
+        RETURNING to_jsonb(old) AS before, to_jsonb(p) AS after;
+    """, (poll_id,))
+    return bool(rows)
+
+
+def close_due_polls():
+    """Close every open poll whose end time has passed; return their ids."""
+    rows = audited("close_poll", "polls", "id", """
+        UPDATE polls p SET status = 'closed', closed_at = LOCALTIMESTAMP
+        FROM (SELECT * FROM polls WHERE status = 'open' AND ends_at <= LOCALTIMESTAMP FOR UPDATE) old
+        WHERE p.id = old.id
+        RETURNING to_jsonb(old) AS before, to_jsonb(p) AS after;
+    """)
+    return [r["after"]["id"] for r in rows]
+
+
+def archive_closed_polls():
+    """Move votes of closed polls to votes_archive and mark the polls archived.
+
+    The option tallies stay on poll_options, so results remain viewable while
+    the live votes table only holds rows for polls that can still change.
+    """
+    rows = audited("archive_poll", "polls", "id", """
+        WITH old AS (
+            SELECT * FROM polls WHERE status = 'closed' FOR UPDATE
+        ), closed AS (
+            UPDATE polls p SET status = 'archived'
+            FROM old WHERE p.id = old.id
+            RETURNING p.id, to_jsonb(old) AS before, to_jsonb(p) AS after
+        ), moved AS (
+            DELETE FROM votes WHERE poll_id IN (SELECT id FROM closed)
+            RETURNING *
+        ), archived AS (
+            INSERT INTO votes_archive SELECT * FROM moved
+        )
+        SELECT before, after FROM closed;
+    """)
+    return len(rows)
+
+
+def sweep_due_polls():
+    """Close due polls in every society; one society failing does not stop the rest."""
+    try:
+        schemas = society_schemas()
+    except Exception as e:
+        print(f"\n⚠️ Poll scheduler: {e}")
+        return
+    for schema in schemas:
+        try:
+            with tenant_scope(schema):
+                close_due_polls()
+        except Exception as e:
+            print(f"\n⚠️ Poll scheduler ({schema}): {e}")
+
+
+def run_poll_scheduler(interval=CLOSE_INTERVAL):
+    """Sweep every society until interrupted; started once per deployment as `python polls.py`.
+
+    A session advisory lock is held while it runs, so a second copy exits
+    instead of sweeping alongside the first.
+    """
+    lock_conn = get_db()
+    lock_conn.autocommit = True
+    try:
+        with lock_conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s);", (SCHEDULER_LOCK,))
+            if not cur.fetchone()[0]:
+                print("ℹ️ A poll scheduler is already running.")
+                return
+        print(f"🗳️ Closing due polls every {interval} seconds (Ctrl+C to stop).")
+        while True:
+            sweep_due_polls()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        lock_conn.close()
+
+
+if __name__ == "__main__":
+    run_poll_scheduler()
@@ -0,0 +1,103 @@
+import threading
+
+from psycopg2.extras import RealDictCursor
+
+from db import pooled_connection
+from resilience import call_with_retry
+
+
+# ---------- NAMED HOT QUERIES ----------
+# Each is PREPAREd once per pooled connection and then run with EXECUTE.
+# Column lists are explicit so later ALTER TABLEs never change a prepared result type.
+QUERIES = {
+    "admin_login": "SELECT username FROM admins WHERE username = $1 AND password = $2",
+    "staff_login": "SELECT username, role, approved FROM staff WHERE username = $1 AND password = $2",
+    "staff_exists": "SELECT 1 FROM staff WHERE username = $1",
+    "resident_login": """
+        SELECT resident_id, name, flat_no FROM residents
+        WHERE flat_no = $1 AND resident_id IN ($2, upper($2), lower($2)) AND approved = TRUE
+    """,
+    "tasks_for_staff": """
+        SELECT id, flat_no, issue, due_date, status, assigned_to, created_at
+        FROM maintenance_tasks WHERE assigned_to = $1
+    """,
+    "skips_for_day": "SELECT flat_no FROM skip_delivery WHERE skip_date = $1 AND item = $2",
+    "complaints_for_flat": "SELECT date, category, description, status FROM complaints WHERE flat_no = $1",
+    "open_polls_for_flat": """
+        SELECT p.id, p.question, p.ends_at FROM polls p
+        WHERE p.status = 'open' AND p.starts_at <= LOCALTIMESTAMP
+          AND (p.ends_at IS NULL OR p.ends_at > LOCALTIMESTAMP)
+          AND NOT EXISTS (SELECT 1 FROM votes v WHERE v.poll_id = p.id AND v.flat_no = $1)
+        ORDER BY p.ends_at NULLS LAST, p.id
+    """,
+    "poll_options": "SELECT id, label FROM poll_options WHERE poll_id = $1 ORDER BY position",
+    # one vote per flat (unique poll_id, flat_no) on a live poll; the tally only moves if the vote row was inserted
+    "record_vote": """
+        WITH v AS (
+            INSERT INTO votes (flat_no, poll_id, option_id)
+            SELECT $1, o.poll_id, o.id
+            FROM poll_options o
+            JOIN polls p ON p.id = o.poll_id
+            WHERE o.id = $3 AND o.poll_id = $2 AND p.status = 'open'
+              AND p.starts_at <= LOCALTIMESTAMP AND (p.ends_at IS NULL OR p.ends_at > LOCALTIMESTAMP)
+            ON CONFLICT (poll_id, flat_no) DO NOTHING
+            RETURNING option_id
+        )
+        UPDATE poll_options SET votes = votes + 1
+        WHERE id = (SELECT option_id FROM v)
+        RETURNING id
+    """,
+}
+
+_stats = {name: {"prepares": 0, "executions": 0} for name in QUERIES}
+_stats_lock = threading.Lock()
+
+
+def execute_prepared(name, params=(), fetch=True, readonly=False):
+    """Run a registered query by name, preparing it first on this connection if needed.
+
+    readonly=True lets a caught-up replica answer it (see db.pooled_connection).
+    """
+    def attempt():
+        with pooled_connection(readonly) as conn:
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            try:
+                prepared_now = name not in conn.prepared
+                if prepared_now:
+                    cur.execute(f"PREPARE {name} AS {QUERIES[name]};")
+                    conn.prepared.add(name)
+
+                if params:
+                    placeholders = ", ".join(["%s"] * len(params))
+                    cur.execute(f"EXECUTE {name} ({placeholders});", params)
+                else:
+                    cur.execute(f"EXECUTE {name};")
+                data = cur.fetchall() if fetch else None
+            finally:
+                cur.close()
+        return data, prepared_now
+
+    # a read can be repeated on another connection if this one dropped
+    data, prepared_now = call_with_retry(attempt) if readonly else attempt()
+
+    with _stats_lock:
+        _stats[name]["executions"] += 1
+        if prepared_now:
+            _stats[name]["prepares"] += 1
+    return data
+
+
+# ---------- INSTRUMENTATION ----------
+def query_stats():
+    """Per-query prepare/execute counts; hits are executions that reused a prepared plan."""
+    with _stats_lock:
+        return {
+            name: dict(s, hits=s["executions"] - s["prepares"])
+            for name, s in _stats.items()
+        }
+
+
+def view_query_stats():
+    print("\n📈 Prepared Query Statistics")
+    for name, s in query_stats().items():
+        print(f"- {name}: executions={s['executions']} | prepared={s['prepares']} | hits={s['hits']}")
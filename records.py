@@ -0,0 +1,14 @@
+from collections import namedtuple
+
+
+# ---------- ROW RECORDS ----------
+# Tuple-backed rows for the large listings: no per-row dict, no repeated key
+# strings, and only the columns the screens actually use.
+ComplaintRow = namedtuple("ComplaintRow", "id flat_no category description status date version")
+TaskRow = namedtuple("TaskRow", "id flat_no issue task_name description assigned_to status due_date created_at")
+BookingRow = namedtuple("BookingRow", "id amenity date time resident_id status")
+
+
+def columns(record):
+    """The SELECT column list for a record type."""
+    return ", ".join(record._fields)
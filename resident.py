@@ -1,39 +1,10 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime, date
-import uuid
-
-
-# ---------- DATABASE CONNECTION ----------
-def get_db():
-    """Connect to PostgreSQL database."""
-    return psycopg2.connect(
-        host="localhost",      # change this to your host
-        database="society_db", # change this to your DB name
-        user="postgres",       # change this to your username
-        password="admin",      # change this to your password
-        port=5432
-    )
-
-
-# ---------- HELPER FUNCTION ----------
-def execute_query(query, params=None, fetch=False, many=False):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        if many:
-            cur.executemany(query, params)
-        else:
-            cur.execute(query, params)
-        if fetch:
-            data = cur.fetchall()
-        else:
-            data = None
-        conn.commit()
-        return data
-    finally:
-        cur.close()
-        conn.close()
+from outbox import outbox
+from announcements import fetch_feed
+from queries import execute_prepared
+from models import NewComplaint, DeliverySkip, ValidationError
+from polls import open_polls_for, poll_options, record_vote
+from identity import new_resident_id
+from audit import audited
 
 
 # ---------- REGISTER RESIDENT ----------
@@ -68,13 +39,14 @@ def register_resident():
 
     name, flat_no, phone, age, members, gender, designation = get_details()
 
-    resident_id = str(uuid.uuid4())[:8]
+    resident_id = new_resident_id()
 
     query = """
-        INSERT INTO residents (resident_id, name, flat_no, phone, age, number_of_members, gender, designation, approved)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, FALSE);
+        INSERT INTO residents AS r (resident_id, name, flat_no, phone, age, number_of_members, gender, designation, approved)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, FALSE)
+        RETURNING NULL::jsonb AS before, to_jsonb(r) AS after;
     """
-    execute_query(query, (resident_id, name, flat_no, phone, age, members, gender, designation))
+    audited("register_resident", "residents", "resident_id", query, (resident_id, name, flat_no, phone, age, members, gender, designation))
     print(f"\n✅ Registered successfully! Your resident ID is: {resident_id}")
     print("⏳ Please wait for admin approval.\n")
     return resident_id
@@ -82,11 +54,7 @@ def register_resident():
 
 # ---------- LOGIN RESIDENT ----------
 def login_resident(flat_no, resident_id):
-    query = """
-        SELECT * FROM residents
-        WHERE flat_no = %s AND resident_id = %s AND approved = TRUE;
-    """
-    resident = execute_query(query, (flat_no, resident_id), fetch=True)
+    resident = execute_prepared("resident_login", (flat_no, resident_id))
     if resident:
         print(f"Welcome, {resident[0]['name']}!")
         return resident[0]
@@ -96,34 +64,30 @@ def login_resident(flat_no, resident_id):
 
 
 # ---------- RAISE COMPLAINT ----------
-def raise_complaint(logged_in_flat_no, entered_flat_no, category, description, complaint_date):
+def raise_complaint(logged_in_flat_no, entered_flat_no, category, description, complaint_date,
+                    idempotency_key=None):
     if entered_flat_no != logged_in_flat_no:
         print("❌ Flat number mismatch.")
         return False
 
     try:
-        complaint_date_obj = datetime.strptime(complaint_date.strip(), "%Y-%m-%d").date()
-        today = datetime.today().date()
-        if complaint_date_obj != today:
-            print(f"❌ Complaint date must be today's date ({today}).")
-            return False
-    except ValueError:
-        print("❌ Invalid date format. Use YYYY-MM-DD.")
+        complaint = NewComplaint.parse(entered_flat_no, category, description, complaint_date)
+    except ValidationError as e:
+        print(f"❌ {e}")
         return False
 
-    query = """
-        INSERT INTO complaints (flat_no, category, description, date, status)
-        VALUES (%s, %s, %s, %s, 'Pending');
-    """
-    execute_query(query, (entered_flat_no, category, description, complaint_date))
+    outbox().enqueue("complaint", {
+        "flat_no": complaint.flat_no, "category": complaint.category,
+        "description": complaint.description, "date": complaint.date,
+    }, idempotency_key)
     print("✅ Complaint submitted successfully!")
     return True
 
 
 # ---------- VIEW MY COMPLAINTS ----------
 def view_my_complaints(flat_no):
-    query = "SELECT * FROM complaints WHERE flat_no = %s;"
-    complaints = execute_query(query, (flat_no,), fetch=True)
+    outbox().flush()
+    complaints = execute_prepared("complaints_for_flat", (flat_no,), readonly=True)
     print(f"\n--- Complaints for Flat {flat_no} ---")
     if not complaints:
         print("ℹ️ No complaints found.")
@@ -138,69 +102,55 @@ def view_my_complaints(flat_no):
 
 
 # ---------- SKIP DELIVERY ----------
-def skip_delivery(logged_in_flat_no, entered_flat_no, item, skip_date):
+def skip_delivery(logged_in_flat_no, entered_flat_no, item, skip_date, idempotency_key=None):
     if entered_flat_no != logged_in_flat_no:
         print("❌ Entered flat number doesn't match your logged-in flat number.")
         return False
 
     try:
-        skip_date_obj = datetime.strptime(skip_date.strip(), "%Y-%m-%d").date()
-        today = datetime.today().date()
-        if skip_date_obj <= today:
-            print("❌ Skip date must be a future date.")
-            return False
-    except ValueError:
-        print("❌ Invalid date format. Use YYYY-MM-DD.")
+        skip = DeliverySkip.parse(entered_flat_no, item, skip_date)
+    except ValidationError as e:
+        print(f"❌ {e}")
         return False
 
-    query = """
-        INSERT INTO skip_delivery (flat_no, item, skip_date)
-        VALUES (%s, %s, %s);
-    """
-    execute_query(query, (entered_flat_no, item, skip_date))
+    outbox().enqueue("skip", {"flat_no": skip.flat_no, "item": skip.item.value, "skip_date": skip.skip_date},
+                     idempotency_key)
     print("✅ Delivery skipped successfully.")
     return True
 
 
 # ---------- PARTICIPATE IN POLL ----------
 def participate_poll(flat_no):
-    poll_query = "SELECT * FROM polls WHERE status = 'open' LIMIT 1;"
-    polls = execute_query(poll_query, fetch=True)
+    polls = open_polls_for(flat_no)
     if not polls:
-        print("ℹ️ No active polls available.")
+        print("ℹ️ No active polls waiting for your vote.")
         return
-    poll = polls[0]
 
-    # Check if already voted
-    vote_check = "SELECT * FROM votes WHERE flat_no = %s AND poll_id = %s;"
-    voted = execute_query(vote_check, (flat_no, poll['id']), fetch=True)
-    if voted:
-        print("⚠️ You have already voted in this poll.")
-        return
+    if len(polls) == 1:
+        poll = polls[0]
+    else:
+        print("\n🗳️ Open Polls")
+        for i, p in enumerate(polls, 1):
+            closes = f" (closes {p['ends_at']:%Y-%m-%d %H:%M})" if p['ends_at'] else ""
+            print(f"{i}. {p['question']}{closes}")
+        pick = input("Choose a poll number: ").strip()
+        if not pick.isdigit() or not 1 <= int(pick) <= len(polls):
+            print("❌ Invalid choice.")
+            return
+        poll = polls[int(pick) - 1]
 
     print(f"\n🗳️ Poll: {poll['question']}")
-    options = poll['options']
+    options = poll_options(poll['id'])
     for i, option in enumerate(options, 1):
-        print(f"{i}. {option}")
+        print(f"{i}. {option['label']}")
 
     try:
         choice = int(input("Enter your choice number: "))
         if 1 <= choice <= len(options):
-            selected_option = options[choice - 1]
-
-            # Update poll votes
-            update_query = f"""
-                UPDATE polls SET votes = jsonb_set(votes, '{{{selected_option}}}', 
-                (COALESCE(votes->>'{selected_option}','0')::int + 1)::text::jsonb) 
-                WHERE id = %s;
-            """
-            execute_query(update_query, (poll['id'],))
-
-            # Record vote
-            insert_vote = "INSERT INTO votes (flat_no, poll_id) VALUES (%s, %s);"
-            execute_query(insert_vote, (flat_no, poll['id']))
-
-            print("✅ Your vote has been recorded. Thank you!")
+            if record_vote(flat_no, poll['id'], options[choice - 1]['id']):
+                print("✅ Your vote has been recorded. Thank you!")
+            else:
+                print("⚠️ Your vote was not recorded: you have already voted or the poll has closed.")
         else:
             print("❌ Invalid choice.")
     except ValueError:
@@ -208,15 +158,14 @@ def participate_poll(flat_no):
 
 
 # ---------- VIEW ANNOUNCEMENTS ----------
-def view_announcements():
+def view_announcements(resident_id):
     print("\n📢 Announcements")
-    query = "SELECT * FROM announcements ORDER BY created_at DESC;"
-    announcements = execute_query(query, fetch=True)
+    announcements = fetch_feed(resident_id)
     if not announcements:
-        print("ℹ️ No announcements available.")
+        print("ℹ️ No new announcements.")
         return
     for a in announcements:
         created_time = a['created_at'].strftime("%Y-%m-%d %H:%M")
         print("\n-------------------------")
-        print(f"🕒 Date: {created_time}")
+        print(f"🕒 Date: {created_time}{'  📌 Pinned' if a['pinned'] else ''}")
         print(f"📢 Message: {a['message']}")
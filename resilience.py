@@ -0,0 +1,103 @@
+import random
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+import config
+
+
+class DatabaseUnavailable(Exception):
+    """The database could not be reached: retries ran out or the circuit is open."""
+
+
+def is_transient(error):
+    """True for errors worth retrying: lost or refused connections, deadlocks, serialization failures.
+
+    A cancelled statement (statement_timeout) is an OperationalError too, but
+    running the same slow query again would not help.
+    """
+    if isinstance(error, psycopg2.extensions.QueryCanceledError):
+        return False
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+
+# ---------- CIRCUIT BREAKER ----------
+class CircuitBreaker:
+    """Stops connection attempts for a while after repeated failures.
+
+    Closed: calls go through. After `threshold` failures in a row it opens and
+    every call fails at once with DatabaseUnavailable. Once `reset_after`
+    seconds have passed one trial call is let through: success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def before(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if self.trial or time.monotonic() - self.opened_at < self.reset_after:
+                raise DatabaseUnavailable("Database is unavailable; try again shortly.")
+            self.trial = True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print("\n⚠️ Database unreachable; pausing connection attempts.")
+                self.opened_at = time.monotonic()
+
+
+_settings = config.resilience_settings()
+breaker = CircuitBreaker(_settings["breaker_threshold"], _settings["breaker_reset"])
+
+
+# ---------- RETRIES ----------
+def backoff_delays(retries=_settings["retries"], base=_settings["backoff_base"], cap=_settings["backoff_max"]):
+    """Sleep times before each retry: exponential with full jitter, so terminals do not retry in step."""
+    for attempt in range(retries):
+        yield random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_with_retry(fn, circuit=None):
+    """Call fn(), retrying transient database errors with backoff.
+
+    With a `circuit`, attempts are refused while it is open and every outcome is
+    reported to it. Non-transient errors are raised unchanged; when retries run
+    out the last transient error is raised as DatabaseUnavailable.
+    """
+    last = None
+    for delay in [0, *backoff_delays()]:
+        time.sleep(delay)
+        if circuit:
+            circuit.before()
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_transient(e):
+                raise
+            if circuit:
+                circuit.failure()
+            last = e
+            continue
+        if circuit:
+            circuit.success()
+        return result
+    raise DatabaseUnavailable(f"Database is unavailable: {last}") from last
@@ -0,0 +1,232 @@
+import re
+from datetime import date
+
+from db import get_db, current_tenant, DEFAULT_TENANT
+from notifications import install_notify_triggers
+from audit import record
+
+
+# table -> date column used as the monthly range partition key
+PARTITIONED_TABLES = {
+    "complaints": "date",
+    "skip_delivery": "skip_date",
+    "amenity_bookings": "date",
+}
+
+# indexes created on the partitioned parent (and so on every partition)
+PARTITION_INDEXES = {
+    "complaints": ["(date)", "(flat_no)"],
+    "skip_delivery": ["(skip_date, item)", "(flat_no)"],
+    "amenity_bookings": ["(status, date)", "(resident_id)", "(amenity, date, slot_start)"],
+}
+
+MONTHS_AHEAD = 3
+RETAIN_MONTHS = 12
+ARCHIVE_SCHEMA = "archive"
+
+
+# ---------- MONTH HELPERS ----------
+def month_start(d):
+    return d.replace(day=1)
+
+
+def add_months(d, n):
+    month = d.month - 1 + n
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_y{month:%Y}m{month:%m}"
+
+
+def archive_schema():
+    """Detached partitions go to "archive", or "<schema>_archive" for other societies."""
+    tenant = current_tenant()
+    return ARCHIVE_SCHEMA if tenant == DEFAULT_TENANT else f"{tenant}_{ARCHIVE_SCHEMA}"
+
+
+def _parse_partition_month(table, name):
+    match = re.fullmatch(rf"{table}_y(\d{{4}})m(\d{{2}})", name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+# ---------- PARTITION MANAGEMENT ----------
+def _create_partitions(cur, table, first, last):
+    """Create one partition per month from first to last (inclusive).
+
+    Postgres refuses to add a partition while the default partition holds rows
+    in its range, so such rows are moved into the new partition: the default is
+    detached, the partition created and filled, and the default attached again.
+    """
+    column = PARTITIONED_TABLES[table]
+    default = f"{table}_default"
+    month = month_start(first)
+    while month <= last:
+        name = partition_name(table, month)
+        bounds = (month, add_months(month, 1))
+        cur.execute("SELECT to_regclass(%s) IS NULL, to_regclass(%s) IS NOT NULL;", (name, default))
+        missing, has_default = cur.fetchone()
+        stray = False
+        if missing and has_default:
+            cur.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= %s AND {column} < %s);", bounds)
+            stray = cur.fetchone()[0]
+
+        if stray:
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {default};")
+        if missing:
+            cur.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s);", bounds)
+        if stray:
+            cur.execute(f"INSERT INTO {name} SELECT * FROM {default} WHERE {column} >= %s AND {column} < %s;", bounds)
+            cur.execute(f"DELETE FROM {default} WHERE {column} >= %s AND {column} < %s;", bounds)
+            cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT;")
+        month = add_months(month, 1)
+
+
+def _indexes(cur, table):
+    """CREATE INDEX statements for every index on `table` except its primary key."""
+    cur.execute("""
+        SELECT pg_get_indexdef(indexrelid) FROM pg_index
+        WHERE indrelid = to_regclass(%s) AND NOT indisprimary;
+    """, (table,))
+    return [definition for (definition,) in cur.fetchall()]
+
+
+def _inbound_foreign_keys(cur, table, column):
+    """(referencing table, constraint, definition) for every foreign key pointing at `table`.
+
+    A partitioned table can only be referenced through a unique key that
+    includes the partition column, so a key that does not is refused here
+    rather than dropped.
+    """
+    cur.execute("""
+        SELECT c.conrelid::regclass::text, c.conname, pg_get_constraintdef(c.oid),
+               %s = ANY (SELECT a.attname FROM pg_attribute a
+                         WHERE a.attrelid = c.confrelid AND a.attnum = ANY (c.confkey))
+        FROM pg_constraint c
+        WHERE c.confrelid = to_regclass(%s) AND c.contype = 'f';
+    """, (column, table))
+    keys = []
+    for referencing, constraint, definition, keyed in cur.fetchall():
+        if not keyed:
+            raise ValueError(f"{referencing}.{constraint} references {table} without {column}; "
+                             f"Postgres cannot keep it once {table} is partitioned.")
+        keys.append((referencing, constraint, definition))
+    return keys
+
+
+def partition_table(cur, table, column):
+    """Convert a plain table into a monthly range-partitioned one.
+
+    Rows are copied into per-month partitions and the serial sequence is handed
+    over to the new table. The primary key becomes (id, <column>), because
+    Postgres requires the partition key in every unique index. Every other index
+    and every foreign key pointing at the table is re-created on the new one;
+    a foreign key that cannot be (see _inbound_foreign_keys) stops the conversion.
+    Returns False if the table is already partitioned.
+    """
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+    row = cur.fetchone()
+    if row is None or row[0] == "p":
+        return False
+
+    # captured under the original name, so they re-create against the new table
+    indexes = _indexes(cur, table)
+    foreign_keys = _inbound_foreign_keys(cur, table, column)
+    for referencing, constraint, _ in foreign_keys:
+        cur.execute(f"ALTER TABLE {referencing} DROP CONSTRAINT {constraint};")
+
+    legacy = f"{table}_legacy"
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+    cur.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p';", (legacy,))
+    for (constraint,) in cur.fetchall():
+        cur.execute(f"ALTER TABLE {legacy} RENAME CONSTRAINT {constraint} TO {legacy}_pkey;")
+    cur.execute(f"""
+        CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE ({column});
+    """)
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id');", (legacy,))
+    sequence = cur.fetchone()[0]
+    if sequence:
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id;")
+    cur.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, {column});")
+
+    today = date.today()
+    cur.execute(f"SELECT min({column}), max({column}) FROM {legacy};")
+    first, last = cur.fetchone()
+    _create_partitions(cur, table, min(first or today, today), add_months(max(last or today, today), MONTHS_AHEAD))
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT;")
+
+    cur.execute(f"INSERT INTO {table} SELECT * FROM {legacy};")
+    # no CASCADE: anything else still depending on the old table stops the conversion
+    cur.execute(f"DROP TABLE {legacy};")
+
+    for definition in indexes:
+        cur.execute(definition + ";")
+    for columns in PARTITION_INDEXES.get(table, []):
+        if not any(definition.endswith(f"USING btree {columns}") for definition in indexes):
+            cur.execute(f"CREATE INDEX ON {table} {columns};")
+    for referencing, constraint, definition in foreign_keys:
+        cur.execute(f"ALTER TABLE {referencing} ADD CONSTRAINT {constraint} {definition};")
+    return True
+
+
+def detach_old_partitions(cur, table, retain_months=RETAIN_MONTHS):
+    """Detach partitions older than the retention window into the archive schema."""
+    cutoff = add_months(month_start(date.today()), -retain_months)
+    cur.execute("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s);
+    """, (table,))
+
+    detached = []
+    for (name,) in cur.fetchall():
+        month = _parse_partition_month(table, name)
+        if month and month < cutoff:
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name};")
+            cur.execute(f"ALTER TABLE {name} SET SCHEMA {archive_schema()};")
+            detached.append(name)
+    return detached
+
+
+# ---------- MAINTENANCE COMMAND ----------
+def rotate_partitions(months_ahead=MONTHS_AHEAD, retain_months=RETAIN_MONTHS):
+    """Partition any unconverted tables, pre-create upcoming months and archive old ones."""
+    conn = get_db()
+    cur = conn.cursor()
+    converted, archived = [], []
+    try:
+        # copying a large table into partitions can outlast the configured statement_timeout
+        cur.execute("SET LOCAL statement_timeout = 0;")
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {archive_schema()};")
+        this_month = month_start(date.today())
+        for table, column in PARTITIONED_TABLES.items():
+            if partition_table(cur, table, column):
+                converted.append(table)
+            _create_partitions(cur, table, this_month, add_months(this_month, months_ahead))
+            for name in detach_old_partitions(cur, table, retain_months):
+                archived.append(name)
+                print(f"📦 Archived partition {name}")
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print("❌ Partition rotation failed:", e)
+        return
+    finally:
+        cur.close()
+        conn.close()
+
+    record("rotate_partitions", "partitions", after={
+        "converted": converted, "archived": archived, "through": add_months(this_month, months_ahead),
+    })
+    if converted:
+        # triggers on the old tables were dropped with them
+        install_notify_triggers()
+        print(f"🗂️ Converted to monthly partitions: {', '.join(converted)}")
+    print(f"✅ Partitions ready through {add_months(this_month, months_ahead):%Y-%m}.")
+
+
+if __name__ == "__main__":
+    rotate_partitions()
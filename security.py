@@ -0,0 +1,239 @@
+import secrets
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import config
+from buffered import BufferedWriter
+from db import execute_query, current_tenant
+from output import render_table
+from models import ValidationError, parse_date, require
+from audit import record
+
+
+PASS_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"    # no 0/O or 1/I
+PASS_LENGTH = 6
+INSIDE_WINDOW_HOURS = 24    # visits still open after this long are not listed as inside
+
+
+# ---------- SCHEMA ----------
+def ensure_security_schema():
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS guest_passes (
+            id BIGSERIAL PRIMARY KEY,
+            code TEXT NOT NULL UNIQUE,
+            flat_no TEXT NOT NULL,
+            guest_name TEXT NOT NULL,
+            valid_from TIMESTAMP NOT NULL,
+            valid_until TIMESTAMP NOT NULL,
+            issued_by TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        );
+    """)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_guest_passes_valid_until ON guest_passes (valid_until);")
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS visitor_log (
+            id BIGSERIAL PRIMARY KEY,
+            visit_id TEXT NOT NULL,
+            event TEXT NOT NULL CHECK (event IN ('in', 'out')),
+            visitor_name TEXT NOT NULL,
+            flat_no TEXT NOT NULL,
+            pass_code TEXT,
+            guard TEXT NOT NULL,
+            at TIMESTAMP NOT NULL
+        );
+    """)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_visitor_log_at ON visitor_log (at);")
+    execute_query("CREATE INDEX IF NOT EXISTS idx_visitor_log_visit ON visitor_log (visit_id, event);")
+
+
+# ---------- GATE LOG WRITER ----------
+# Gate events are timestamped when they happen and written in batches, so a
+# guard never waits on the database to let someone in or out.
+_gate_log = BufferedWriter("gate-log", """
+    INSERT INTO visitor_log (visit_id, event, visitor_name, flat_no, pass_code, guard, at) VALUES %s
+""")
+_gate_log_lock = threading.Lock()
+
+
+def gate_log():
+    with _gate_log_lock:
+        if not _gate_log.is_alive() and not _gate_log.stopped.is_set():
+            _gate_log.start()
+    return _gate_log
+
+
+# ---------- ACTIVE PASS INDEX ----------
+class PassIndex:
+    """Unexpired guest passes by code, reloaded from the database every cache_ttl("passes") seconds.
+
+    A code that is not in the index is looked up once by its unique index, so
+    passes issued on another terminal are still accepted before the next reload.
+    """
+
+    def __init__(self):
+        self.passes = {}
+        self.loaded = {}
+        self.lock = threading.Lock()
+
+    def _reload(self, schema):
+        rows = execute_query("""
+            SELECT code, flat_no, guest_name, valid_from, valid_until FROM guest_passes
+            WHERE valid_until > LOCALTIMESTAMP;
+        """, fetch=True, readonly=True)
+        with self.lock:
+            self.passes[schema] = {r["code"]: r for r in rows}
+            self.loaded[schema] = time.monotonic()
+
+    def add(self, guest_pass):
+        with self.lock:
+            self.passes.setdefault(current_tenant(), {})[guest_pass["code"]] = guest_pass
+
+    def get(self, code):
+        schema = current_tenant()
+        if time.monotonic() - self.loaded.get(schema, float("-inf")) > config.cache_ttl("passes"):
+            self._reload(schema)
+        with self.lock:
+            found = self.passes.get(schema, {}).get(code)
+        if found is None:
+            rows = execute_query("""
+                SELECT code, flat_no, guest_name, valid_from, valid_until FROM guest_passes
+                WHERE code = %s AND valid_until > LOCALTIMESTAMP;
+            """, (code,), fetch=True)
+            if rows:
+                found = rows[0]
+                self.add(found)
+        return found
+
+
+active_passes = PassIndex()
+
+
+# ---------- GUEST PASSES ----------
+def issue_pass(flat_no, guest_name, visit_date, days=1, issued_by=None):
+    """Create a guest pass valid from the start of `visit_date` for `days` days; return its code."""
+    valid_from = datetime.combine(visit_date, datetime.min.time())
+    valid_until = valid_from + timedelta(days=days)
+    for _ in range(5):
+        code = "".join(secrets.choice(PASS_ALPHABET) for _ in range(PASS_LENGTH))
+        rows = execute_query("""
+            INSERT INTO guest_passes (code, flat_no, guest_name, valid_from, valid_until, issued_by)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (code) DO NOTHING
+            RETURNING code, flat_no, guest_name, valid_from, valid_until;
+        """, (code, flat_no, guest_name, valid_from, valid_until, issued_by or flat_no), fetch=True)
+        if rows:
+            active_passes.add(rows[0])
+            record("issue_pass", f"guest_passes/{code}", after=dict(rows[0], issued_by=issued_by or flat_no))
+            return code
+    raise RuntimeError("Could not generate a unique pass code.")
+
+
+def issue_pass_flow(flat_no):
+    print("\n🎟️ Issue Guest Pass")
+    try:
+        guest = require(input("Guest name: "), "Guest name")
+        visit_date = parse_date(input("Visit date (YYYY-MM-DD): "))
+        if visit_date < datetime.now().date():
+            raise ValidationError("Visit date cannot be in the past.")
+        days_text = input("Valid for how many days? (Enter for 1): ").strip()
+        days = int(days_text) if days_text.isdigit() and int(days_text) > 0 else 1
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    code = issue_pass(flat_no, guest, visit_date, days)
+    print(f"✅ Pass code for {guest}: {code} (valid from {visit_date} for {days} day(s))")
+
+
+# ---------- GATE ----------
+def check_in(guard, visitor_name, flat_no, pass_code=None):
+    visit_id = uuid.uuid4().hex[:12]
+    gate_log().add((visit_id, "in", visitor_name, flat_no, pass_code, guard, datetime.now()))
+    return visit_id
+
+
+def check_out(guard, visit):
+    gate_log().add((visit["visit_id"], "out", visit["visitor_name"], visit["flat_no"], None, guard, datetime.now()))
+
+
+def currently_inside():
+    """Visitors checked in within the last day with no check-out, this terminal's buffered events included."""
+    gate_log().flush()
+    rows = execute_query("""
+        SELECT i.visit_id, i.visitor_name, i.flat_no, i.at FROM visitor_log i
+        WHERE i.event = 'in' AND i.at >= LOCALTIMESTAMP - %s * INTERVAL '1 hour'
+          AND NOT EXISTS (SELECT 1 FROM visitor_log o WHERE o.visit_id = i.visit_id AND o.event = 'out')
+        ORDER BY i.at;
+    """, (INSIDE_WINDOW_HOURS,), fetch=True)
+    return rows
+
+
+def check_in_flow(guard):
+    code = input("Pass code (Enter for walk-in): ").strip().upper()
+    if code:
+        guest_pass = active_passes.get(code)
+        now = datetime.now()
+        if not guest_pass or not guest_pass["valid_from"] <= now < guest_pass["valid_until"]:
+            print("❌ Pass not valid right now.")
+            return
+        check_in(guard, guest_pass["guest_name"], guest_pass["flat_no"], code)
+        print(f"✅ {guest_pass['guest_name']} checked in for Flat {guest_pass['flat_no']}.")
+        return
+
+    try:
+        name = require(input("Visitor name: "), "Visitor name")
+        flat_no = require(input("Visiting flat: "), "Flat number")
+    except ValidationError as e:
+        print(f"❌ {e}")
+        return
+    check_in(guard, name, flat_no)
+    print(f"✅ {name} checked in for Flat {flat_no}.")
+
+
+def check_out_flow(guard):
+    visits = currently_inside()
+    if not visits:
+        print("ℹ️ Nobody is checked in.")
+        return
+    for n, v in enumerate(visits, 1):
+        print(f"{n}. {v['visitor_name']} → Flat {v['flat_no']} (in at {v['at']:%H:%M})")
+    choice = input("Number to check out: ").strip()
+    if not choice.isdigit() or not 1 <= int(choice) <= len(visits):
+        print("❌ Invalid choice.")
+        return
+    visit = visits[int(choice) - 1]
+    check_out(guard, visit)
+    print(f"👋 {visit['visitor_name']} checked out.")
+
+
+def view_inside():
+    visits = currently_inside()
+    if not render_table(["Visitor", "Flat", "In At"],
+                        ((v['visitor_name'], v['flat_no'], f"{v['at']:%Y-%m-%d %H:%M}") for v in visits)):
+        print("ℹ️ Nobody is checked in.")
+
+
+# ---------- SECURITY MENU ----------
+def security_menu(username):
+    gate_log()
+    while True:
+        print("\n--- Security Gate Menu ---")
+        print("1. Check in visitor")
+        print("2. Check out visitor")
+        print("3. Who is inside")
+        print("4. Logout")
+
+        choice = input("Enter choice: ").strip()
+        if choice == "1":
+            check_in_flow(username)
+        elif choice == "2":
+            check_out_flow(username)
+        elif choice == "3":
+            view_inside()
+        elif choice == "4":
+            gate_log().flush()
+            print("Logging out...")
+            break
+        else:
+            print("❌ Invalid choice. Try again.")
@@ -0,0 +1,261 @@
+from db import execute_query, ensure_trigger, current_tenant
+from output import render_table
+
+
+RESOLVED_STATUSES = ("Completed", "Resolved")
+
+# days overdue -> bucket label (lower bound inclusive, upper bound exclusive)
+AGING_BUCKETS = [
+    (1, 3, "1-2 days"),
+    (3, 8, "3-7 days"),
+    (8, 31, "8-30 days"),
+    (31, None, "30+ days"),
+]
+
+_RESOLVED_SQL = ", ".join(f"'{s}'" for s in RESOLVED_STATUSES)
+
+
+# ---------- SCHEMA ----------
+def ensure_sla_schema():
+    """Create the transition log, the incremental summaries and their triggers."""
+    fresh = execute_query("SELECT to_regclass(%s) IS NULL AS fresh;",
+                          (f"{current_tenant()}.task_sla_open",), fetch=True)[0]["fresh"]
+
+    execute_query("""
+        ALTER TABLE maintenance_tasks
+            ADD COLUMN IF NOT EXISTS category TEXT,
+            ADD COLUMN IF NOT EXISTS status_changed_at TIMESTAMP,
+            ADD COLUMN IF NOT EXISTS resolved_at TIMESTAMP;
+    """)
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS task_status_history (
+            id BIGSERIAL PRIMARY KEY,
+            task_id INTEGER NOT NULL,
+            old_status TEXT,
+            new_status TEXT,
+            changed_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        );
+    """)
+    execute_query("CREATE INDEX IF NOT EXISTS idx_task_status_history_task ON task_status_history (task_id, changed_at);")
+
+    # open tasks counted per (staff, category, due date): overdue/aging reads this, not the task table
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS task_sla_open (
+            assigned_to TEXT NOT NULL,
+            category TEXT NOT NULL,
+            due_date DATE NOT NULL,
+            open_count INTEGER NOT NULL,
+            PRIMARY KEY (assigned_to, category, due_date)
+        );
+    """)
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS task_sla_resolved (
+            assigned_to TEXT NOT NULL,
+            category TEXT NOT NULL,
+            resolved_count INTEGER NOT NULL,
+            resolve_seconds DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (assigned_to, category)
+        );
+    """)
+
+    _install_sla_triggers()
+    if fresh:
+        rebuild_sla_summary()
+
+
+def _install_sla_triggers():
+    execute_query(f"""
+        CREATE OR REPLACE FUNCTION task_sla_stamp() RETURNS trigger AS $$
+        DECLARE
+            changed BOOLEAN := TRUE;
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                IF NEW.category IS NULL THEN
+                    IF NEW.is_common THEN
+                        NEW.category := 'common';
+                    ELSE
+                        SELECT c.category INTO NEW.category FROM complaints c WHERE c.id = NEW.source_complaint_id;
+                    END IF;
+                    NEW.category := COALESCE(NEW.category, 'general');
+                END IF;
+            ELSE
+                changed := NEW.status IS DISTINCT FROM OLD.status;
+            END IF;
+
+            IF changed THEN
+                NEW.status_changed_at := LOCALTIMESTAMP;
+                IF NEW.status IN ({_RESOLVED_SQL}) THEN
+                    NEW.resolved_at := LOCALTIMESTAMP;
+                ELSE
+                    NEW.resolved_at := NULL;
+                END IF;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    execute_query(f"""
+        CREATE OR REPLACE FUNCTION task_sla_track() RETURNS trigger AS $$
+        DECLARE
+            old_open BOOLEAN := FALSE;
+            new_open BOOLEAN := FALSE;
+            moved BOOLEAN := FALSE;
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                old_open := COALESCE(OLD.status NOT IN ({_RESOLVED_SQL}), TRUE);
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_open := COALESCE(NEW.status NOT IN ({_RESOLVED_SQL}), TRUE);
+            END IF;
+
+            IF TG_OP = 'UPDATE' THEN
+                IF NEW.status IS NOT DISTINCT FROM OLD.status
+                   AND NEW.assigned_to IS NOT DISTINCT FROM OLD.assigned_to
+                   AND NEW.due_date IS NOT DISTINCT FROM OLD.due_date
+                   AND NEW.category IS NOT DISTINCT FROM OLD.category THEN
+                    RETURN NULL;
+                END IF;
+                moved := NEW.assigned_to IS DISTINCT FROM OLD.assigned_to
+                         OR NEW.category IS DISTINCT FROM OLD.category;
+            END IF;
+
+            IF old_open THEN
+                UPDATE task_sla_open SET open_count = open_count - 1
+                WHERE assigned_to = COALESCE(OLD.assigned_to, '')
+                  AND category = COALESCE(OLD.category, 'general')
+                  AND due_date = COALESCE(OLD.due_date, 'infinity');
+                DELETE FROM task_sla_open
+                WHERE assigned_to = COALESCE(OLD.assigned_to, '')
+                  AND category = COALESCE(OLD.category, 'general')
+                  AND due_date = COALESCE(OLD.due_date, 'infinity')
+                  AND open_count <= 0;
+            END IF;
+
+            IF new_open THEN
+                INSERT INTO task_sla_open AS o (assigned_to, category, due_date, open_count)
+                VALUES (COALESCE(NEW.assigned_to, ''), COALESCE(NEW.category, 'general'),
+                        COALESCE(NEW.due_date, 'infinity'), 1)
+                ON CONFLICT (assigned_to, category, due_date) DO UPDATE SET open_count = o.open_count + 1;
+            END IF;
+
+            -- a resolved task leaves its resolved group when it is deleted, reopened or reassigned
+            IF TG_OP <> 'INSERT' AND NOT old_open AND (TG_OP = 'DELETE' OR new_open OR moved) THEN
+                UPDATE task_sla_resolved
+                SET resolved_count = resolved_count - 1,
+                    resolve_seconds = resolve_seconds - COALESCE(EXTRACT(EPOCH FROM OLD.resolved_at - OLD.created_at), 0)
+                WHERE assigned_to = COALESCE(OLD.assigned_to, '') AND category = COALESCE(OLD.category, 'general');
+            END IF;
+
+            IF TG_OP <> 'DELETE' AND NOT new_open AND (TG_OP = 'INSERT' OR old_open OR moved) THEN
+                INSERT INTO task_sla_resolved AS r (assigned_to, category, resolved_count, resolve_seconds)
+                VALUES (COALESCE(NEW.assigned_to, ''), COALESCE(NEW.category, 'general'), 1,
+                        COALESCE(EXTRACT(EPOCH FROM NEW.resolved_at - NEW.created_at), 0))
+                ON CONFLICT (assigned_to, category) DO UPDATE
+                SET resolved_count = r.resolved_count + 1,
+                    resolve_seconds = r.resolve_seconds + EXCLUDED.resolve_seconds;
+            END IF;
+
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO task_status_history (task_id, old_status, new_status) VALUES (NEW.id, NULL, NEW.status);
+            ELSIF TG_OP = 'UPDATE' AND NEW.status IS DISTINCT FROM OLD.status THEN
+                INSERT INTO task_status_history (task_id, old_status, new_status) VALUES (NEW.id, OLD.status, NEW.status);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    ensure_trigger("maintenance_tasks", "maintenance_tasks_sla_stamp", """
+        BEFORE INSERT OR UPDATE ON maintenance_tasks
+        FOR EACH ROW EXECUTE PROCEDURE task_sla_stamp()
+    """)
+    ensure_trigger("maintenance_tasks", "maintenance_tasks_sla_track", """
+        AFTER INSERT OR UPDATE OR DELETE ON maintenance_tasks
+        FOR EACH ROW EXECUTE PROCEDURE task_sla_track()
+    """)
+
+
+def rebuild_sla_summary():
+    """Recompute both summary tables from maintenance_tasks (first install or repair)."""
+    execute_query("""
+        UPDATE maintenance_tasks t
+        SET category = COALESCE(CASE WHEN t.is_common THEN 'common' END,
+                                (SELECT c.category FROM complaints c WHERE c.id = t.source_complaint_id),
+                                'general')
+        WHERE t.category IS NULL;
+    """)
+    execute_query("TRUNCATE task_sla_open, task_sla_resolved;")
+    execute_query(f"""
+        INSERT INTO task_sla_open (assigned_to, category, due_date, open_count)
+        SELECT COALESCE(assigned_to, ''), category, COALESCE(due_date, 'infinity'), count(*)
+        FROM maintenance_tasks
+        WHERE COALESCE(status NOT IN ({_RESOLVED_SQL}), TRUE)
+        GROUP BY 1, 2, 3;
+    """)
+    execute_query(f"""
+        INSERT INTO task_sla_resolved (assigned_to, category, resolved_count, resolve_seconds)
+        SELECT COALESCE(assigned_to, ''), category, count(*),
+               COALESCE(sum(EXTRACT(EPOCH FROM resolved_at - created_at)), 0)
+        FROM maintenance_tasks
+        WHERE status IN ({_RESOLVED_SQL})
+        GROUP BY 1, 2;
+    """)
+
+
+# ---------- REPORTS ----------
+def sla_report():
+    """Overdue/open counts, aging buckets and mean time to resolve per staff and category.
+
+    Reads only the summary tables, whose size depends on the number of distinct
+    (staff, category, due date) groups rather than on the number of tasks.
+    """
+    bucket_columns = []
+    for low, high, label in AGING_BUCKETS:
+        # LEAST keeps the 'infinity' placeholder for tasks without a due date out of the subtraction
+        days_overdue = "CURRENT_DATE - LEAST(due_date, CURRENT_DATE)"
+        condition = f"{days_overdue} >= {low}"
+        if high is not None:
+            condition += f" AND {days_overdue} < {high}"
+        bucket_columns.append(
+            f"COALESCE(sum(open_count) FILTER (WHERE due_date < CURRENT_DATE AND {condition}), 0) AS \"{label}\""
+        )
+
+    query = f"""
+        WITH open_tasks AS (
+            SELECT assigned_to, category,
+                   sum(open_count) AS open_tasks,
+                   COALESCE(sum(open_count) FILTER (WHERE due_date < CURRENT_DATE), 0) AS overdue,
+                   {", ".join(bucket_columns)}
+            FROM task_sla_open
+            GROUP BY assigned_to, category
+        )
+        SELECT COALESCE(o.assigned_to, r.assigned_to) AS assigned_to,
+               COALESCE(o.category, r.category) AS category,
+               COALESCE(o.open_tasks, 0) AS open_tasks,
+               COALESCE(o.overdue, 0) AS overdue,
+               {", ".join(f'COALESCE(o."{label}", 0) AS "{label}"' for _, _, label in AGING_BUCKETS)},
+               COALESCE(r.resolved_count, 0) AS resolved,
+               r.resolve_seconds / NULLIF(r.resolved_count, 0) / 3600.0 AS mean_hours_to_resolve
+        FROM open_tasks o
+        FULL JOIN task_sla_resolved r USING (assigned_to, category)
+        ORDER BY overdue DESC, assigned_to, category;
+    """
+    return execute_query(query, fetch=True, readonly=True)
+
+
+def view_sla_report():
+    rows = sla_report()
+    if not rows:
+        print("ℹ️ No maintenance tasks recorded yet.")
+        return
+
+    labels = [label for _, _, label in AGING_BUCKETS]
+    table = (
+        [r['assigned_to'] or "-", r['category'], r['open_tasks'], r['overdue'],
+         *[r[label] for label in labels], r['resolved'],
+         f"{r['mean_hours_to_resolve']:.1f}" if r['mean_hours_to_resolve'] is not None else "-"]
+        for r in rows
+    )
+    print("\n⏱️ Maintenance SLA Report")
+    render_table(["Staff", "Category", "Open", "Overdue", *labels, "Resolved", "Mean Hrs"], table)
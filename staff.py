@@ -1,35 +1,6 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
-
-
-
-def get_db():
-    """Connect to PostgreSQL database."""
-    return psycopg2.connect(
-        host="localhost",      
-        database="society_db", 
-        user="postgres",       
-        password="admin",      
-        port=5432
-    )
-
-
-
-def execute_query(query, params=None, fetch=False):
-    conn = get_db()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    try:
-        cur.execute(query, params)
-        if fetch:
-            data = cur.fetchall()
-        else:
-            data = None
-        conn.commit()
-        return data
-    finally:
-        cur.close()
-        conn.close()
-
+from queries import execute_prepared
+from models import StaffRole, require, ValidationError
+from audit import set_actor, audited
 
 
 def register_staff():
@@ -38,24 +9,28 @@ def register_staff():
     password = input("Enter password: ").strip()
     role = input("Enter role (delivery/maintenance/security): ").strip().lower()
 
-    valid_roles = {"delivery", "maintenance", "security"}
-    if role not in valid_roles:
-        print("⚠️ Invalid role. Choose from: delivery, maintenance, or security.")
+    try:
+        username = require(username, "Username")
+        password = require(password, "Password")
+        role = StaffRole.parse(role)
+    except ValidationError as e:
+        print(f"⚠️ {e}")
         return
 
    
-    query_check = "SELECT * FROM staff WHERE username = %s;"
-    existing = execute_query(query_check, (username,), fetch=True)
+    existing = execute_prepared("staff_exists", (username,))
     if existing:
         print("⚠️ Username already exists. Try again.")
         return
 
     
+    # the password is left out of the audit entry
     query_insert = """
-        INSERT INTO staff (username, password, role, approved)
-        VALUES (%s, %s, %s, %s);
+        INSERT INTO staff AS s (username, password, role, approved)
+        VALUES (%s, %s, %s, %s)
+        RETURNING NULL::jsonb AS before, to_jsonb(s) - 'password' AS after;
     """
-    execute_query(query_insert, (username, password, role, False))
+    audited("register_staff", "staff", "username", query_insert, (username, password, role.value, False))
     print(f"✅ Registered successfully: {username} ({role})\n⏳ Awaiting admin approval.")
 
 
@@ -65,8 +40,7 @@ def staff_login():
     username = input("Enter staff username: ").strip()
     password = input("Enter staff password: ").strip()
 
-    query = "SELECT * FROM staff WHERE username = %s AND password = %s;"
-    staff = execute_query(query, (username, password), fetch=True)
+    staff = execute_prepared("staff_login", (username, password))
 
     if staff:
         staff_member = staff[0]
@@ -74,6 +48,7 @@ def staff_login():
             print("⏳ Your account is not yet approved by admin.")
             return None
 
+        set_actor(f"staff:{staff_member['username']}")
         print(f"✅ Login successful! Welcome {staff_member['username']} ({staff_member['role']})")
         return staff_member
     else:
@@ -0,0 +1,119 @@
+import re
+
+from psycopg2 import errors
+
+from db import execute_query, set_tenant, current_tenant, DEFAULT_TENANT
+from audit import audited
+
+
+# Tables every society starts with; the feature tables (poll_options, task_sla_*, ...)
+# are added by migrations.migrate_society().
+TENANT_TABLES = (
+    "admins", "staff", "residents", "complaints", "maintenance_tasks", "skip_delivery",
+    "amenities", "amenity_bookings", "polls", "votes", "announcements",
+)
+
+SOCIETY_CODE = re.compile(r"[a-z][a-z0-9_]{0,29}")
+
+# Raise whenever a migration step is added or changed: a society is offered at
+# sign-in only once migrations.py has brought it up to this version.
+SCHEMA_VERSION = 5
+
+
+# ---------- REGISTRY ----------
+def ensure_society_registry():
+    """Create the shared society list and register the original install as 'default'."""
+    execute_query("""
+        CREATE TABLE IF NOT EXISTS public.societies (
+            code TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            schema_name TEXT NOT NULL UNIQUE,
+            created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+        );
+    """)
+    execute_query("ALTER TABLE public.societies ADD COLUMN IF NOT EXISTS schema_version INTEGER NOT NULL DEFAULT 0;")
+    execute_query("""
+        INSERT INTO public.societies (code, name, schema_name)
+        VALUES ('default', 'Default Society', %s)
+        ON CONFLICT (code) DO NOTHING;
+    """, (DEFAULT_TENANT,))
+
+
+def list_societies():
+    return execute_query("""
+        SELECT code, name, schema_name, schema_version FROM public.societies ORDER BY code;
+    """, fetch=True, readonly=True)
+
+
+def society_schemas():
+    """Every tenant schema, for jobs that sweep all societies."""
+    return [s["schema_name"] for s in list_societies()]
+
+
+# ---------- CREATE ----------
+def create_society(code, name):
+    """Create a schema for a new society with empty copies of the base tables.
+
+    Indexes and constraints are copied with each table, so every index is
+    scoped to one society. Serial columns keep drawing from the shared
+    sequences, which keeps ids unique across the whole deployment.
+    The society is registered at schema version 0; migrations.migrate_society()
+    must add the feature tables before anyone can sign in to it.
+    Returns the new schema name.
+    """
+    code = code.strip().lower()
+    if not SOCIETY_CODE.fullmatch(code):
+        raise ValueError("Society code must start with a letter and use only a-z, 0-9 and _ (max 30).")
+
+    schema = f"society_{code}"
+    execute_query(f"CREATE SCHEMA IF NOT EXISTS {schema};")
+    for table in TENANT_TABLES:
+        execute_query(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{table}
+            (LIKE {DEFAULT_TENANT}.{table} INCLUDING ALL);
+        """)
+    audited("create_society", "societies", "code", """
+        INSERT INTO public.societies AS s (code, name, schema_name) VALUES (%s, %s, %s)
+        RETURNING NULL::jsonb AS before, to_jsonb(s) AS after;
+    """, (code, name, schema))
+    return schema
+
+
+def set_schema_version(schema, version=SCHEMA_VERSION):
+    execute_query("UPDATE public.societies SET schema_version = %s WHERE schema_name = %s;", (version, schema))
+
+
+# ---------- SELECT ----------
+def choose_society():
+    """Ask which society to sign in to; skipped when only one exists.
+
+    Returns False if the code entered is unknown or the society's schema has
+    not been migrated to SCHEMA_VERSION yet.
+    """
+    try:
+        societies = list_societies()
+    except errors.UndefinedTable:
+        print("⚠️ The database is not set up yet; run `python migrations.py` first.")
+        return False
+
+    chosen = None
+    if len(societies) == 1:
+        chosen = societies[0]
+    else:
+        print("\n🏢 Societies")
+        for s in societies:
+            marker = " (current)" if s["schema_name"] == current_tenant() else ""
+            print(f"- {s['code']}: {s['name']}{marker}")
+        code = input("Enter society code (Enter keeps current): ").strip().lower()
+        for s in societies:
+            if s["code"] == code or (not code and s["schema_name"] == current_tenant()):
+                chosen = s
+        if chosen is None:
+            print("❌ Unknown society code.")
+            return False
+
+    if chosen["schema_version"] < SCHEMA_VERSION:
+        print(f"⚠️ Society '{chosen['code']}' needs `python migrations.py` before it can be used.")
+        return False
+    set_tenant(chosen["schema_name"])
+    return True